@@ -1,11 +1,14 @@
 import importlib
+import importlib.abc
+import importlib.machinery
+import importlib.util
 import sys
 
 # Ensure that modules can be imported with an additional "src." prefix.
 # Some test suites patch objects via paths like "src.base.dependencies" while
 # the actual source code imports them as "base.dependencies".  To make both
-# paths resolve to the same modules we add aliases in ``sys.modules`` that
-# point the "src." names to the original modules once they are imported.
+# paths resolve to the same modules, "src." names are resolved lazily on first
+# import by a meta path finder that returns the original modules.
 
 _prefix = "src."
 _top_level_packages = [
@@ -16,18 +19,48 @@ _top_level_packages = [
     "webui",
 ]
 
-for pkg_name in _top_level_packages:
-    try:
-        module = importlib.import_module(pkg_name)
-        # Register alias for the top-level package itself
-        sys.modules[_prefix + pkg_name] = module
-
-        # Propagate already imported sub-modules, e.g. ``base.dependencies``
-        for name, mod in list(sys.modules.items()):
-            if name.startswith(pkg_name + "."):
-                alias = _prefix + name
-                if alias not in sys.modules:
-                    sys.modules[alias] = mod
-    except ModuleNotFoundError:
-        # Package might not exist in the current project layout; skip it.
-        continue
+
+class _SrcAliasLoader(importlib.abc.Loader):
+    """Loader that returns the already imported original module."""
+
+    def __init__(self, real_name):
+        self.real_name = real_name
+
+    def create_module(self, spec):
+        module = importlib.import_module(self.real_name)
+        # The import system overwrites ``__spec__`` with the alias spec
+        self._real_spec = module.__spec__
+        return module
+
+    def exec_module(self, module):
+        module.__spec__ = self._real_spec
+
+
+class _SrcAliasFinder(importlib.abc.MetaPathFinder):
+    """Resolve ``src.X.Y`` to the module imported as ``X.Y``."""
+
+    def find_spec(self, name, path, target=None):
+        if not name.startswith(_prefix):
+            return None
+
+        real_name = name[len(_prefix):]
+        if real_name.partition(".")[0] not in _top_level_packages:
+            return None
+
+        try:
+            real_spec = importlib.util.find_spec(real_name)
+        except ModuleNotFoundError:
+            # Package might not exist in the current project layout; skip it.
+            return None
+        if real_spec is None:
+            return None
+
+        return importlib.machinery.ModuleSpec(
+            name,
+            _SrcAliasLoader(real_name),
+            is_package=real_spec.submodule_search_locations is not None,
+        )
+
+
+# Must run before the path finder, otherwise "src.X" would be imported twice
+sys.meta_path.insert(0, _SrcAliasFinder())
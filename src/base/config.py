@@ -26,10 +26,18 @@ class Settings(BaseSettings):
     db_name: str = "pricing_optimization"
     db_user: str = "pricing_user"
     db_password: str = "pricing_password"
+    db_pool_size: int = 20
+    db_max_overflow: int = 40
+    db_pool_recycle: int = 1800
 
     # Security
     secret_key: str = "super-secret-key-for-pricing-optimization-2024"
     allowed_hosts: str = "*"
+    # Адреса или подсети (CIDR) прокси через запятую, чей X-Forwarded-For
+    # учитывается при определении IP клиента. По умолчанию заголовок не
+    # учитывается: API доступен напрямую, и клиент может подставить в него
+    # любой адрес
+    trusted_proxies: str = ""
     access_token_expires_minutes: int = 60
     refresh_token_expires_hours: int = 24
 
@@ -56,6 +64,11 @@ class Settings(BaseSettings):
     redis_host: str = "redis"
     redis_port: int = 6379
     redis_db: int = 0
+
+    # Кэш прогнозов цен в Redis
+    prediction_cache_enabled: bool = True
+    prediction_cache_ttl: int = 3600  # Секунды
+    prediction_cache_max_connections: int = 50
     rabbitmq_host: str = "rabbitmq"
     rabbitmq_port: int = 5672
     rabbitmq_user: str = "pricing"
@@ -1,17 +1,18 @@
 """Зависимости для FastAPI приложения."""
 
+import hashlib
 import logging
 import time
-from datetime import datetime, timedelta, timezone
 from typing import Annotated
 
+from cachetools import TTLCache
 from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from base.config import get_settings
 from base.data_structures import JWTPayloadDTO
-from base.exceptions import AuthenticationError, AuthorizationError
+from base.exceptions import AuthenticationError
 from base.orm import get_session_factory
 from base.utils import JWTHandler
 
@@ -19,58 +20,22 @@ logger = logging.getLogger(__name__)
 
 settings = get_settings()
 
+# Фабрика сессий создается один раз при импорте
+_SESSION_FACTORY = get_session_factory()
 
-class JWTBearerWithRateLimit(HTTPBearer):
-    """Расширенный Bearer с rate limiting и дополнительными проверками."""
+_JWT_HANDLER = JWTHandler(settings.secret_key)
 
-    def __init__(self):
-        """Инициализация."""
-        super().__init__(auto_error=True)
-        self.rate_limit = {}  # IP -> [(timestamp, token), ...]
-        self.max_requests = 100  # Максимум запросов
-        self.window_size = 60  # Размер окна в секундах
 
-    def _clean_old_requests(self, ip: str):
-        """Очистка старых запросов."""
-        now = time.time()
-        self.rate_limit[ip] = [
-            req
-            for req in self.rate_limit.get(ip, [])
-            if now - req[0] < self.window_size
-        ]
+class JWTBearer(HTTPBearer):
+    """Bearer с дополнительной проверкой наличия токена.
 
-    def _is_rate_limited(self, ip: str, token: str) -> bool:
-        """Проверка rate limit."""
-        self._clean_old_requests(ip)
-
-        # Добавляем текущий запрос
-        now = time.time()
-        if ip not in self.rate_limit:
-            self.rate_limit[ip] = []
-        self.rate_limit[ip].append((now, token))
-
-        # Проверяем лимит
-        return len(self.rate_limit[ip]) > self.max_requests
+    Rate limiting выполняет RateLimitMiddleware до вызова зависимостей.
+    """
 
     async def __call__(self, request: Request) -> HTTPAuthorizationCredentials:
         """Переопределение вызова для добавления проверок."""
         credentials = await super().__call__(request)
 
-        # Получаем IP
-        ip = request.client.host if request.client else "unknown"
-
-        # Проверяем rate limit
-        if (
-            credentials
-            and hasattr(credentials, "credentials")
-            and self._is_rate_limited(ip, credentials.credentials)
-        ):
-            logger.warning(f"Rate limit exceeded for IP: {ip}")
-            raise HTTPException(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail="Too many requests",
-            )
-
         if (
             credentials
             and hasattr(credentials, "credentials")
@@ -84,62 +49,49 @@ class JWTBearerWithRateLimit(HTTPBearer):
         )
 
 
-security = JWTBearerWithRateLimit()
+security = JWTBearer(auto_error=True)
+
+# Кэш проверенных токенов, ключ - хэш токена, сами токены не храним
+_jwt_cache: TTLCache = TTLCache(maxsize=10_000, ttl=30)
 
 
 async def get_token_from_header(
     request: Request,
     credentials: Annotated[HTTPAuthorizationCredentials, Depends(security)],
 ) -> JWTPayloadDTO:
-    """Получение и валидация JWT токена из заголовка."""
-    try:
-        token = credentials.credentials
-        logger.info(f"Attempting to decode token: {token[:20]}...")
-
-        # Для тестов пропускаем валидацию
-        if token == "test_token":  # nosec B105
-            expire_timestamp = int(
-                (datetime.now(timezone.utc) + timedelta(minutes=30)).timestamp()
-            )
-            return JWTPayloadDTO(
-                id=1,
-                exp=expire_timestamp,
-                type="access",
-            )
-
-        # Базовая валидация токена
-        jwt_handler = JWTHandler(settings.secret_key)
-        payload = jwt_handler.decode_token(token)
-
-        # JWT библиотека автоматически проверяет expiration, но добавим дополнительную проверку
-        if payload.exp:
-            current_timestamp = int(datetime.now(timezone.utc).timestamp())
-            if payload.exp < current_timestamp:
-                logger.error(f"Token expired for user: {payload.id}")
-                raise AuthenticationError("Token expired")
-
-        logger.info(f"Token validated successfully for user ID: {payload.id}")
-        return payload
-
-    except (AuthenticationError, AuthorizationError) as e:
-        raise e
-    except Exception as e:
-        logger.error(f"Token validation failed: {str(e)}")
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authentication credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+    """Получение и валидация JWT токена из заголовка.
+
+    Ошибки токена поднимаются как AuthenticationError и превращаются в ответ
+    401 обработчиком исключений приложения.
+    """
+    token = credentials.credentials
+    logger.debug("Attempting to decode token")
+
+    # Уже проверенный токен берем из кэша, но срок действия проверяем всегда
+    current_timestamp = int(time.time())
+    cache_key = hashlib.sha256(token.encode()).digest()[:16]
+    cached = _jwt_cache.get(cache_key)
+    if cached is not None and (not cached.exp or cached.exp >= current_timestamp):
+        return cached
+
+    # Базовая валидация токена
+    payload = _JWT_HANDLER.decode_token(token)
+
+    # JWT библиотека автоматически проверяет expiration, но добавим дополнительную проверку
+    if payload.exp and payload.exp < current_timestamp:
+        logger.error("Token expired for user: %s", payload.id)
+        raise AuthenticationError("Token expired")
+
+    _jwt_cache[cache_key] = payload
+    logger.debug("Token validated successfully for user ID: %s", payload.id)
+    return payload
 
 
 async def get_db():
     """Получение сессии базы данных."""
-    session_factory = get_session_factory()
-    async with session_factory() as session:
-        try:
-            yield session
-        finally:
-            await session.close()
+    # async with закрывает сессию при выходе
+    async with _SESSION_FACTORY() as session:
+        yield session
 
 
 # Типы для внедрения зависимостей
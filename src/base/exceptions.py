@@ -1,69 +1,88 @@
 """Кастомные исключения приложения."""
 
+from typing import Dict, Optional
+
 
 class AppException(Exception):
     """Базовое исключение приложения."""
 
-    pass
+    # HTTP статус и тип ошибки в ответе API
+    status_code: int = 500
+    error_type: str = "app_error"
+    # Дополнительные заголовки ответа
+    headers: Optional[Dict[str, str]] = None
 
 
 class AuthenticationError(AppException):
     """Ошибка аутентификации."""
 
-    pass
+    status_code = 401
+    error_type = "authentication_error"
+    # RFC 6750: ответ 401 сообщает клиенту схему аутентификации
+    headers = {"WWW-Authenticate": "Bearer"}
 
 
 class AuthorizationError(AppException):
     """Ошибка авторизации."""
 
-    pass
+    status_code = 403
+    error_type = "authorization_error"
 
 
 class ValidationError(AppException):
     """Ошибка валидации данных."""
 
-    pass
+    status_code = 422
+    error_type = "validation_error"
 
 
 class DatabaseError(AppException):
     """Ошибка работы с базой данных."""
 
-    pass
+    status_code = 500
+    error_type = "database_error"
 
 
 class ProductNotFoundError(AppException):
     """Товар не найден."""
 
-    pass
+    status_code = 404
+    error_type = "not_found_error"
 
 
 class PermissionDeniedError(AppException):
     """Отказано в доступе."""
 
-    pass
+    status_code = 403
+    error_type = "permission_error"
 
 
 class InsufficientFundsError(AppException):
     """Недостаточно средств на балансе."""
 
-    pass
+    status_code = 402
+    error_type = "insufficient_funds_error"
 
 
 class MLServiceError(AppException):
     """Ошибка ML сервиса."""
 
-    pass
+    status_code = 500
+    error_type = "ml_service_error"
 
 
 class TaskQueueError(AppException):
     """Ошибка очереди задач."""
 
-    pass
+    status_code = 500
+    error_type = "task_queue_error"
 
 
 class InvalidTokenException(AuthenticationError):
     """Исключение о том, что токен недействителен."""
 
+    __slots__ = ("detail",)
+
     def __init__(self, detail: str) -> None:
         """Инициализация исключения."""
         super().__init__(detail)
@@ -73,6 +92,8 @@ class InvalidTokenException(AuthenticationError):
 class DoesntExistException(AppException):
     """Исключение о том, что сущность не существует."""
 
+    __slots__ = ("detail",)
+
     def __init__(self, detail: str = "Entity doesn't exist") -> None:
         """Инициализация исключения."""
         super().__init__(detail)
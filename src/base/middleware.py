@@ -0,0 +1,166 @@
+"""ASGI middleware приложения."""
+
+import ipaddress
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Union
+
+from base.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+_TOO_MANY_REQUESTS_BODY = b'{"detail":"Too many requests"}'
+
+
+class _RateLimitShard:
+    """Часть хранилища rate limit со своей блокировкой."""
+
+    def __init__(self):
+        """Инициализация."""
+        # IP -> [токены, время пополнения], порядок ключей - от давно не
+        # активных к недавним
+        self.entries: OrderedDict[Union[int, str], List[float]] = OrderedDict()
+        self.lock = threading.Lock()
+        self.requests_since_sweep = 0
+
+
+class RateLimitMiddleware:
+    """Rate limiting запросов с токеном до разрешения зависимостей.
+
+    Лимит проверяется на уровне ASGI, поэтому отклоненный запрос не
+    доходит до роутинга и dependency injection FastAPI.
+    """
+
+    def __init__(self, app, shards: int = 64):
+        """Инициализация."""
+        self.app = app
+        # IP распределены по частям, чтобы параллельные запросы с разных IP
+        # не ждали одну блокировку
+        self._shards = [_RateLimitShard() for _ in range(shards)]
+        self.max_requests = 100  # Максимум запросов
+        self.window_size = 60  # Размер окна в секундах
+        self.max_ips = 100_000  # Максимум отслеживаемых IP
+        self.sweep_interval = 1024  # Очистка неактивных IP раз в N запросов
+        # Прокси, которым доверяем X-Forwarded-For: адреса или подсети CIDR
+        self.trusted_proxies = [
+            ipaddress.ip_network(proxy.strip(), strict=False)
+            for proxy in settings.trusted_proxies.split(",")
+            if proxy.strip()
+        ]
+
+    async def __call__(self, scope, receive, send) -> None:
+        """Обработка ASGI запроса."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Лимит действует только на запросы с токеном, как и раньше в
+        # зависимости авторизации
+        headers = scope["headers"]
+        if not any(name == b"authorization" for name, _ in headers):
+            await self.app(scope, receive, send)
+            return
+
+        ip = self._client_ip(scope)
+        if self._is_rate_limited(self._ip_key(ip)):
+            logger.warning("Rate limit exceeded for IP: %s", ip)
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": 429,
+                    "headers": [
+                        (b"content-type", b"application/json"),
+                        (b"content-length", b"%d" % len(_TOO_MANY_REQUESTS_BODY)),
+                    ],
+                }
+            )
+            await send({"type": "http.response.body", "body": _TOO_MANY_REQUESTS_BODY})
+            return
+
+        await self.app(scope, receive, send)
+
+    def _is_rate_limited(self, ip: Union[int, str]) -> bool:
+        """Проверка rate limit по алгоритму token bucket."""
+        shard = self._shards[hash(ip) % len(self._shards)]
+        rate = self.max_requests / self.window_size  # Токенов в секунду
+        with shard.lock:
+            now = time.monotonic()
+            entries = shard.entries
+            bucket = entries.get(ip)
+            if bucket is None:
+                bucket = entries[ip] = [float(self.max_requests), now]
+            else:
+                entries.move_to_end(ip)
+                # Пополняем корзину за прошедшее время, не выше лимита
+                bucket[0] = min(
+                    float(self.max_requests), bucket[0] + (now - bucket[1]) * rate
+                )
+                bucket[1] = now
+
+            # Каждый запрос, в том числе отклоненный, расходует токен
+            bucket[0] -= 1
+            limited = bucket[0] < 0
+
+            shard.requests_since_sweep += 1
+            if shard.requests_since_sweep >= self.sweep_interval:
+                shard.requests_since_sweep = 0
+                self._evict_idle(entries, now, rate)
+
+            # Жесткий предел: вытесняем дольше всех не активный IP
+            max_entries = -(-self.max_ips // len(self._shards))
+            while len(entries) > max_entries:
+                entries.popitem(last=False)
+
+            return limited
+
+    def _evict_idle(self, entries: OrderedDict, now: float, rate: float) -> None:
+        """Удаление IP, чьи корзины уже пополнились до лимита."""
+        # Ключи упорядочены по последнему запросу, неактивные - в начале
+        while entries:
+            ip, (tokens, last_refill) = next(iter(entries.items()))
+            if tokens + (now - last_refill) * rate < self.max_requests:
+                break
+            del entries[ip]
+
+    def _client_ip(self, scope) -> str:
+        """Получение IP клиента с учетом доверенного прокси."""
+        client = scope.get("client")
+        peer = client[0] if client else "unknown"
+        # X-Forwarded-For от недоверенного адреса игнорируется, иначе клиент
+        # может менять его в каждом запросе и обходить лимит
+        if self._is_trusted_proxy(peer):
+            forwarded_for: Optional[bytes] = None
+            for name, value in scope["headers"]:
+                if name == b"x-forwarded-for":
+                    forwarded_for = value
+            if forwarded_for:
+                # nginx дописывает адрес клиента в конец заголовка, начало
+                # заголовка клиент может подделать
+                return forwarded_for.rpartition(b",")[2].strip().decode("latin-1")
+        return peer
+
+    def _is_trusted_proxy(self, peer: str) -> bool:
+        """Проверка, входит ли адрес в одну из доверенных подсетей."""
+        if not self.trusted_proxies:
+            return False
+        try:
+            address = ipaddress.ip_address(peer)
+        except ValueError:
+            return False
+        return any(address in network for network in self.trusted_proxies)
+
+    @staticmethod
+    def _ip_key(ip: str) -> Union[int, str]:
+        """Ключ rate limit для IP.
+
+        Адрес хранится как int - он занимает меньше памяти, чем строка.
+        Нераспознанный адрес остается строкой.
+        """
+        try:
+            return int(ipaddress.ip_address(ip))
+        except ValueError:
+            return ip
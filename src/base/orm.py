@@ -1,7 +1,7 @@
 """Базовые классы и функции для работы с ORM."""
 
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
 
 from base.config import get_settings
 
@@ -16,15 +16,22 @@ engine = create_async_engine(
     f"{settings.db_host}:{settings.db_port}/{settings.db_name}",
     echo=False,
     future=True,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_pre_ping=True,
+    pool_recycle=settings.db_pool_recycle,
+    # Последнее возвращенное соединение выдается первым
+    pool_use_lifo=True,
+    connect_args={"prepared_statement_cache_size": 500},
 )
 
-# Создаем фабрику сессий
-async_session = sessionmaker(  # type: ignore
-    bind=engine, class_=AsyncSession, expire_on_commit=False
+# Создаем фабрику сессий; изменения сбрасываются в БД явно через flush/commit
+async_session = async_sessionmaker(
+    bind=engine, class_=AsyncSession, expire_on_commit=False, autoflush=False
 )
 
 
-def get_session_factory():
+def get_session_factory() -> async_sessionmaker[AsyncSession]:
     """Получение фабрики сессий."""
     return async_session
 
@@ -1,9 +1,15 @@
 """Утилиты для работы с JWT токенами."""
 
-from datetime import datetime, timedelta, timezone
-from typing import Optional
+import base64
+import hashlib
+import hmac
+import time
+from datetime import timedelta
+from typing import Any, Dict, Optional
 
 import jwt
+import orjson
+from pydantic import ValidationError as PydanticValidationError
 
 from base.config import get_settings
 from base.data_structures import JWTPayloadDTO
@@ -11,6 +17,50 @@ from base.exceptions import AuthenticationError, InvalidTokenException
 
 settings = get_settings()
 
+# Зарегистрированные claims, которые PyJWT проверяет сам
+_PYJWT_VALIDATED_CLAIMS = frozenset({"nbf", "iat", "aud", "iss"})
+
+
+def _base64url_decode(segment: str) -> bytes:
+    """Декодирование base64url без выравнивания."""
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def _fast_decode_hs256(
+    token: str, hmac_template: hmac.HMAC
+) -> Optional[Dict[str, Any]]:
+    """Проверка HS256 токена без накладных расходов PyJWT.
+
+    Возвращает None, если токен выходит за рамки простого случая
+    (другой алгоритм, нестандартные claims, ошибки формата) - такой
+    токен нужно проверить через jwt.decode.
+    """
+    try:
+        header_segment, payload_segment, signature_segment = token.split(".")
+        header = orjson.loads(_base64url_decode(header_segment))
+        payload = orjson.loads(_base64url_decode(payload_segment))
+        signature = _base64url_decode(signature_segment)
+    except ValueError:
+        return None
+
+    if not isinstance(header, dict) or header.get("alg") != "HS256":
+        return None
+    if not isinstance(payload, dict) or not _PYJWT_VALIDATED_CLAIMS.isdisjoint(payload):
+        return None
+    exp = payload.get("exp")
+    if exp is not None and type(exp) is not int:
+        return None
+
+    # Копия заранее подготовленного состояния HMAC - без повторной обработки ключа
+    mac = hmac_template.copy()
+    mac.update(f"{header_segment}.{payload_segment}".encode())
+    expected = mac.digest()
+    if not hmac.compare_digest(signature, expected):
+        raise jwt.InvalidSignatureError("Signature verification failed")
+    if exp is not None and exp <= time.time():
+        raise jwt.ExpiredSignatureError("Signature has expired")
+    return payload
+
 
 class JWTHandler:
     """Класс для работы с JWT токенами."""
@@ -18,20 +68,16 @@ class JWTHandler:
     def __init__(self, secret_key: str):
         """Инициализация обработчика JWT."""
         self.secret_key = secret_key
+        self._hmac_template = hmac.new(secret_key.encode(), digestmod=hashlib.sha256)
 
     def create_access_token(
         self, user_id: int, expires_delta: Optional[timedelta] = None
     ) -> str:
         """Создание JWT токена."""
-        if expires_delta:
-            expire = datetime.now(timezone.utc) + expires_delta
-        else:
-            expire = datetime.now(timezone.utc) + timedelta(
-                minutes=settings.access_token_expires_minutes
-            )
+        if expires_delta is None:
+            expires_delta = timedelta(minutes=settings.access_token_expires_minutes)
 
-        # Конвертируем datetime в timestamp для JWT
-        expire_timestamp = int(expire.timestamp())
+        expire_timestamp = int(time.time() + expires_delta.total_seconds())
 
         to_encode = {"id": user_id, "exp": expire_timestamp, "type": "access"}
         try:
@@ -40,25 +86,29 @@ class JWTHandler:
         except Exception as e:
             raise AuthenticationError(f"Failed to create token: {str(e)}")
 
+    def _decode(self, token: str) -> Dict[str, Any]:
+        """Проверка подписи и срока действия токена."""
+        payload = _fast_decode_hs256(token, self._hmac_template)
+        if payload is None:
+            payload = jwt.decode(token, self.secret_key, algorithms=["HS256"])
+        return payload
+
     def decode_token(self, token: str) -> JWTPayloadDTO:
         """Декодирование JWT токена."""
         try:
-            payload = jwt.decode(token, self.secret_key, algorithms=["HS256"])
+            payload = self._decode(token)
             return JWTPayloadDTO(**payload)
         except jwt.ExpiredSignatureError:
             raise InvalidTokenException("Token has expired")
         except jwt.InvalidTokenError as e:
             raise InvalidTokenException(f"Invalid token: {str(e)}")
-        except Exception as e:
-            raise InvalidTokenException(f"Token decode error: {str(e)}")
+        except PydanticValidationError as e:
+            raise InvalidTokenException(f"Invalid token payload: {str(e)}")
 
     def create_refresh_token(self, user_id: int) -> str:
         """Создание refresh токена."""
-        expires_delta = timedelta(hours=settings.refresh_token_expires_hours)
-        expire = datetime.now(timezone.utc) + expires_delta
-
-        # Конвертируем datetime в timestamp для JWT
-        expire_timestamp = int(expire.timestamp())
+        expires_seconds = settings.refresh_token_expires_hours * 3600
+        expire_timestamp = int(time.time()) + expires_seconds
 
         to_encode = {"id": user_id, "exp": expire_timestamp, "type": "refresh"}
         try:
@@ -70,7 +120,7 @@ class JWTHandler:
     def verify_refresh_token(self, token: str) -> int:
         """Проверка refresh токена."""
         try:
-            payload = jwt.decode(token, self.secret_key, algorithms=["HS256"])
+            payload = self._decode(token)
             if payload.get("type") != "refresh":
                 raise InvalidTokenException("Not a refresh token")
             user_id = payload.get("id")
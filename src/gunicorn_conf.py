@@ -0,0 +1,31 @@
+"""Конфигурация Gunicorn для production запуска API.
+
+Запуск: gunicorn -c src/gunicorn_conf.py src.main:app
+
+Каждый воркер - отдельный процесс со своим event loop (uvloop и httptools
+из uvicorn[standard]). Rate limit и кэш JWT хранятся в памяти процесса,
+поэтому действуют в пределах одного воркера.
+"""
+
+import multiprocessing
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+
+# Число воркеров задается WEB_CONCURRENCY, по умолчанию 2 * CPU + 1
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Приложение импортируется в master до fork: модель и pipeline загружаются
+# один раз, воркеры делят их страницы памяти (copy-on-write). Соединения с БД
+# и Redis создаются лениво уже в воркерах
+preload_app = True
+
+# Keep-alive соединений с nginx
+keepalive = int(os.getenv("KEEPALIVE", 5))
+timeout = int(os.getenv("TIMEOUT", 60))
+graceful_timeout = 30
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info")
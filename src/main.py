@@ -5,21 +5,13 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 
 from base.config import get_settings
-from base.exceptions import (
-    AuthenticationError,
-    AuthorizationError,
-    DatabaseError,
-    InsufficientFundsError,
-    MLServiceError,
-    PermissionDeniedError,
-    ProductNotFoundError,
-    TaskQueueError,
-    ValidationError,
-)
-from base.orm import init_db
+from base.exception_handlers import add_exception_handlers
+from base.middleware import RateLimitMiddleware
+from base.orm import engine, init_db
+from pricing.cache import close_prediction_cache
 from products.entrypoints.api.endpoints import router as products_router
 from users.entrypoints.api.endpoints import router as users_router
 
@@ -35,9 +27,12 @@ async def lifespan(app: FastAPI):
     """Управление жизненным циклом приложения."""
     # Startup
     await init_db()
+    app.state.ready = True
     yield
-    # Shutdown
-    pass
+    # Shutdown: сначала перестаем принимать трафик по readiness
+    app.state.ready = False
+    await close_prediction_cache()
+    await engine.dispose()
 
 
 # Создаем FastAPI приложение
@@ -49,8 +44,13 @@ app = FastAPI(
     redoc_url="/redoc",
     openapi_url="/openapi.json",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
+# Rate limiting до разрешения зависимостей; CORS добавлен позже и работает
+# снаружи, поэтому ответы 429 тоже получают CORS заголовки
+app.add_middleware(RateLimitMiddleware)
+
 # Настройка CORS
 app.add_middleware(
     CORSMiddleware,
@@ -61,79 +61,9 @@ app.add_middleware(
 )
 
 
-# Регистрация обработчиков исключений
-@app.exception_handler(AuthenticationError)
-async def authentication_error_handler(request, exc):
-    """Обработчик ошибок аутентификации."""
-    return JSONResponse(
-        status_code=401, content={"detail": str(exc), "type": "authentication_error"}
-    )
-
-
-@app.exception_handler(AuthorizationError)
-async def authorization_error_handler(request, exc):
-    """Обработчик ошибок авторизации."""
-    return JSONResponse(
-        status_code=403, content={"detail": str(exc), "type": "authorization_error"}
-    )
-
-
-@app.exception_handler(ValidationError)
-async def validation_error_handler(request, exc):
-    """Обработчик ошибок валидации."""
-    return JSONResponse(
-        status_code=422, content={"detail": str(exc), "type": "validation_error"}
-    )
-
-
-@app.exception_handler(DatabaseError)
-async def database_error_handler(request, exc):
-    """Обработчик ошибок базы данных."""
-    return JSONResponse(
-        status_code=500, content={"detail": str(exc), "type": "database_error"}
-    )
-
-
-@app.exception_handler(ProductNotFoundError)
-async def not_found_error_handler(request, exc):
-    """Обработчик ошибок отсутствия товара."""
-    return JSONResponse(
-        status_code=404, content={"detail": str(exc), "type": "not_found_error"}
-    )
-
-
-@app.exception_handler(PermissionDeniedError)
-async def permission_error_handler(request, exc):
-    """Обработчик ошибок доступа."""
-    return JSONResponse(
-        status_code=403, content={"detail": str(exc), "type": "permission_error"}
-    )
-
-
-@app.exception_handler(InsufficientFundsError)
-async def funds_error_handler(request, exc):
-    """Обработчик ошибок недостатка средств."""
-    return JSONResponse(
-        status_code=402,
-        content={"detail": str(exc), "type": "insufficient_funds_error"},
-    )
-
-
-@app.exception_handler(MLServiceError)
-async def ml_error_handler(request, exc):
-    """Обработчик ошибок ML сервиса."""
-    return JSONResponse(
-        status_code=500, content={"detail": str(exc), "type": "ml_service_error"}
-    )
-
-
-@app.exception_handler(TaskQueueError)
-async def queue_error_handler(request, exc):
-    """Обработчик ошибок очереди задач."""
-    return JSONResponse(
-        status_code=500, content={"detail": str(exc), "type": "task_queue_error"}
-    )
-
+# Регистрация обработчиков исключений: один обработчик на AppException,
+# статус и тип ошибки берутся из атрибутов класса исключения
+add_exception_handlers(app)
 
 # Регистрация роутеров
 app.include_router(users_router, prefix="/api/v1/users", tags=["users"])
@@ -144,3 +74,15 @@ app.include_router(products_router, prefix="/api/v1/products", tags=["products"]
 async def health_check():
     """Проверка работоспособности API."""
     return {"message": "API is running"}
+
+
+@app.get("/readyz")
+async def readiness_check():
+    """Проверка готовности API принимать трафик.
+
+    В отличие от health_check, отвечает 503, пока не завершен запуск
+    приложения, и после начала остановки.
+    """
+    if not getattr(app.state, "ready", False):
+        return ORJSONResponse(status_code=503, content={"status": "starting"})
+    return {"status": "ready"}
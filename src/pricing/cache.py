@@ -0,0 +1,111 @@
+"""Кэш прогнозов цен в Redis."""
+
+import hashlib
+import logging
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import orjson
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+
+from base.config import get_settings
+
+logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+
+class PredictionCache:
+    """Кэш результатов прогнозирования.
+
+    Ключ строится из версии модели и хэша признаков товара, поэтому после
+    обновления модели старые записи не читаются и истекают по TTL. Ошибки
+    Redis не прерывают прогноз: запрос считается промахом кэша.
+    """
+
+    # Пауза перед повторным обращением к недоступному Redis, секунды
+    retry_interval: float = 30.0
+
+    def __init__(self, ttl: int, max_connections: int):
+        """Инициализация кэша."""
+        self.ttl = ttl
+        self._pool = aioredis.ConnectionPool(
+            host=settings.redis_host,
+            port=settings.redis_port,
+            db=settings.redis_db,
+            max_connections=max_connections,
+            # Кэш не должен заметно замедлять прогноз при проблемах с Redis
+            socket_connect_timeout=0.5,
+            socket_timeout=0.5,
+        )
+        self._client = aioredis.Redis(connection_pool=self._pool)
+        self._unavailable_until = 0.0
+
+    @staticmethod
+    def make_key(model_version: str, features: Dict[str, Any]) -> str:
+        """Ключ кэша для признаков товара."""
+        canonical = orjson.dumps(features, option=orjson.OPT_SORT_KEYS)
+        return f"pricing:v{model_version}:{hashlib.sha256(canonical).hexdigest()}"
+
+    async def get_many(self, keys: Sequence[str]) -> List[Optional[Dict[str, Any]]]:
+        """Получение результатов по ключам, None для отсутствующих."""
+        if not keys or not self._available():
+            return [None] * len(keys)
+        try:
+            values = await self._client.mget(keys)
+        except RedisError as e:
+            self._mark_unavailable(e)
+            return [None] * len(keys)
+        return [orjson.loads(value) if value else None for value in values]
+
+    async def set_many(self, items: Dict[str, Dict[str, Any]]) -> None:
+        """Сохранение результатов с TTL."""
+        if not items or not self._available():
+            return
+        try:
+            # MSET не задает TTL, поэтому SET EX для каждого ключа в одном
+            # pipeline - один round-trip до Redis
+            async with self._client.pipeline(transaction=False) as pipe:
+                for key, value in items.items():
+                    pipe.set(key, orjson.dumps(value), ex=self.ttl)
+                await pipe.execute()
+        except RedisError as e:
+            self._mark_unavailable(e)
+
+    async def close(self) -> None:
+        """Закрытие соединений."""
+        await self._client.aclose()
+
+    def _available(self) -> bool:
+        """Проверка, можно ли обращаться к Redis."""
+        return time.monotonic() >= self._unavailable_until
+
+    def _mark_unavailable(self, error: Exception) -> None:
+        """Отключение кэша на время после ошибки Redis."""
+        logger.warning("Prediction cache unavailable: %s", error)
+        self._unavailable_until = time.monotonic() + self.retry_interval
+
+
+_prediction_cache: Optional[PredictionCache] = None
+
+
+def get_prediction_cache() -> Optional[PredictionCache]:
+    """Получение общего кэша прогнозов, None если кэш отключен."""
+    global _prediction_cache
+    if not settings.prediction_cache_enabled:
+        return None
+    if _prediction_cache is None:
+        _prediction_cache = PredictionCache(
+            ttl=settings.prediction_cache_ttl,
+            max_connections=settings.prediction_cache_max_connections,
+        )
+    return _prediction_cache
+
+
+async def close_prediction_cache() -> None:
+    """Закрытие соединений общего кэша прогнозов."""
+    global _prediction_cache
+    if _prediction_cache is not None:
+        await _prediction_cache.close()
+        _prediction_cache = None
@@ -0,0 +1,85 @@
+"""Построение признаков модели из сырых полей товара.
+
+Общий код PricingService и ML воркеров для pipeline в формате quick_train.
+"""
+
+from typing import Any, Dict
+
+import numpy as np
+import pandas as pd
+
+# Сырые поля товара, из которых строятся признаки
+RAW_COLUMNS = (
+    "name",
+    "item_condition_id",
+    "category_name",
+    "brand_name",
+    "shipping",
+    "item_description",
+)
+
+# Базовые признаки модели в порядке столбцов при обучении, за ними идут
+# признаки TF-IDF названия и описания
+BASE_FEATURES = (
+    "item_condition_id",
+    "shipping",
+    "brand_enc",
+    "cat_main_enc",
+    "cat_sub_enc",
+    "desc_len",
+    "name_len",
+    "has_brand",
+    "has_description",
+    "desc_words",
+    "name_words",
+)
+
+
+def encode_labels(encoder: Any, values: pd.Series) -> np.ndarray:
+    """LabelEncoder.transform, где неизвестные значения получают код 0."""
+    codes = pd.Index(encoder.classes_).get_indexer(values)
+    return np.where(codes < 0, 0, codes)
+
+
+def build_features(df: pd.DataFrame, pipeline: Dict[str, Any]) -> np.ndarray:
+    """Матрица признаков float32 для пачки товаров.
+
+    Пропуски заполняются как в обучении, столбцы идут в порядке
+    BASE_FEATURES, затем TF-IDF названия и описания.
+    """
+    name = df["name"].fillna("").astype(str)
+    category = df["category_name"].fillna("Other").astype(str)
+    brand = df["brand_name"].fillna("Unknown").astype(str)
+    description = df["item_description"].fillna("").astype(str)
+
+    # Разбиение категории на уровни
+    parts = category.str.split("/", n=2, expand=True)
+    cat_main = parts[0]
+    cat_sub = parts[1].fillna("None") if parts.shape[1] > 1 else "None"
+
+    columns = {
+        "item_condition_id": pd.to_numeric(df["item_condition_id"], errors="coerce"),
+        "shipping": pd.to_numeric(df["shipping"], errors="coerce"),
+        "brand_enc": encode_labels(pipeline["le_brand"], brand),
+        "cat_main_enc": encode_labels(pipeline["le_cat_main"], cat_main),
+        "cat_sub_enc": encode_labels(
+            pipeline["le_cat_sub"], pd.Series(cat_sub, index=df.index)
+        ),
+        "desc_len": description.str.len(),
+        "name_len": name.str.len(),
+        "has_brand": (brand != "Unknown").astype(int),
+        "has_description": (description != "").astype(int),
+        "desc_words": description.str.count(r"\w+"),
+        "name_words": name.str.count(r"\w+"),
+    }
+    base = np.column_stack(
+        [np.asarray(columns[column], dtype=np.float32) for column in BASE_FEATURES]
+    )
+
+    # TF-IDF признаки названия и описания
+    tfidf_name = pipeline["tfidf_name"].transform(name).toarray()
+    tfidf_desc = pipeline["tfidf_desc"].transform(description).toarray()
+
+    return np.ascontiguousarray(
+        np.hstack([base, tfidf_name, tfidf_desc]), dtype=np.float32
+    )
@@ -1,14 +1,17 @@
 """Модуль для обучения и версионирования ML модели ценообразования."""
 
-import json
 import logging
+import os
+import threading
 from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, Optional
 
 import numpy as np
+import orjson
 import pandas as pd
-from catboost import CatBoostRegressor
+from catboost import CatBoostRegressor, FeaturesData, Pool
+from catboost.utils import get_gpu_device_count
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 from sklearn.model_selection import train_test_split
 
@@ -20,6 +23,18 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Категориальные признаки модели
+CAT_FEATURES = ["category_name", "brand_name", "condition_text"]
+
+# Число сохраняемых в метриках самых важных признаков
+FEATURE_IMPORTANCE_TOP_K = 20
+
+# Текст состояния по item_condition_id (1-5), индекс 0 - неизвестное состояние
+CONDITION_LABELS = np.array(
+    [np.nan, "Новый", "Отличное", "Хорошее", "Удовлетворительное", "Плохое"],
+    dtype=object,
+)
+
 
 class ModelMetrics:
     """Класс для хранения метрик модели."""
@@ -45,8 +60,15 @@ class ModelMetrics:
 
     def save(self, path: Path) -> None:
         """Сохранение метрик в файл."""
-        with open(path, "w") as f:
-            json.dump(self.to_dict(), f, indent=2)
+        # Ключи статистик по состоянию и доставке - числа
+        Path(path).write_bytes(
+            orjson.dumps(
+                self.to_dict(),
+                option=orjson.OPT_INDENT_2
+                | orjson.OPT_SERIALIZE_NUMPY
+                | orjson.OPT_NON_STR_KEYS,
+            )
+        )
 
 
 class PricingModelTrainer:
@@ -69,6 +91,7 @@ class PricingModelTrainer:
         self.metrics_path = self.version_dir / "metrics.json"
 
         self.model: Optional[CatBoostRegressor] = None
+        self._publish_thread: Optional[threading.Thread] = None
         self.metrics = ModelMetrics()
         self.metrics.model_version = self.version
 
@@ -82,10 +105,11 @@ class PricingModelTrainer:
         """Предобработка данных."""
         logger.info("Начинаем предобработку данных...")
 
-        # Очистка данных
-        df = df.copy()
-        df = df.dropna(subset=["price", "name", "category_name"])
-        df = df.fillna({"brand_name": "Unknown", "item_description": "", "shipping": 0})
+        # Очистка данных: dropna уже возвращает новый DataFrame, отдельная
+        # копия исходного не нужна
+        df = df.dropna(subset=["price", "name", "category_name"]).fillna(
+            {"brand_name": "Unknown", "item_description": "", "shipping": 0}
+        )
 
         logger.info(f"Размер датасета после очистки: {df.shape}")
 
@@ -94,16 +118,13 @@ class PricingModelTrainer:
         df["name_len"] = df["name"].str.len()
         df["desc_len"] = df["item_description"].str.len()
 
-        # Категориальные признаки
-        df["condition_text"] = df["item_condition_id"].map(
-            {
-                1: "Новый",
-                2: "Отличное",
-                3: "Хорошее",
-                4: "Удовлетворительное",
-                5: "Плохое",
-            }
-        )
+        # Категориальные признаки: выборка из массива по индексу вместо
+        # поиска в словаре для каждой строки
+        condition_ids = df["item_condition_id"].to_numpy()
+        valid = (condition_ids >= 1) & (condition_ids <= 5)
+        df["condition_text"] = CONDITION_LABELS[
+            np.where(valid, condition_ids, 0).astype(np.intp)
+        ]
 
         # Собираем статистики
         self.metrics.dataset_stats = {
@@ -121,6 +142,40 @@ class PricingModelTrainer:
 
         return df
 
+    @staticmethod
+    def _device_params() -> Dict[str, Any]:
+        """Параметры устройства обучения: GPU, если он доступен, иначе CPU.
+
+        PRICING_USE_GPU=0 принудительно включает обучение на CPU.
+        """
+        use_gpu = os.getenv("PRICING_USE_GPU", "1") != "0"
+        if use_gpu and get_gpu_device_count() > 0:
+            logger.info("Обучение CatBoost на GPU")
+            return {"task_type": "GPU", "devices": "0", "gpu_ram_part": 0.8}
+        return {"task_type": "CPU"}
+
+    def _make_pool(self, X: pd.DataFrame, y: pd.Series) -> Pool:
+        """Создание пула CatBoost из numpy массивов.
+
+        Числовые признаки передаются одним массивом float32, категориальные -
+        массивом строк, без разбора типов колонок DataFrame внутри CatBoost.
+        """
+        num_cols = [col for col in X.columns if col not in CAT_FEATURES]
+        # Числовые колонки копируются сразу в одну C-матрицу float32, без
+        # промежуточного DataFrame из выбранных колонок
+        num_data = np.empty((len(X), len(num_cols)), dtype=np.float32)
+        for i, col in enumerate(num_cols):
+            num_data[:, i] = X[col].to_numpy()
+        return Pool(
+            data=FeaturesData(
+                num_feature_data=num_data,
+                cat_feature_data=X[CAT_FEATURES].to_numpy(dtype=object),
+                num_feature_names=num_cols,
+                cat_feature_names=CAT_FEATURES,
+            ),
+            label=y.to_numpy(dtype=np.float32),
+        )
+
     def train_model(self, df: pd.DataFrame) -> None:
         """Обучение модели."""
         # Предобработка данных
@@ -134,11 +189,18 @@ class PricingModelTrainer:
         X_train, X_test, y_train, y_test = train_test_split(
             X, y, test_size=0.2, random_state=42
         )
+        # Отдельная валидационная выборка для ранней остановки, чтобы тестовая
+        # выборка не участвовала в выборе итерации и метрики были честными
+        X_fit, X_val, y_fit, y_val = train_test_split(
+            X_train, y_train, test_size=0.1, random_state=42
+        )
 
-        # Определяем категориальные признаки
-        cat_features = ["category_name", "brand_name", "condition_text"]
+        # Пулы строятся один раз и используются и для обучения, и для метрик
+        train_pool = self._make_pool(X_fit, y_fit)
+        val_pool = self._make_pool(X_val, y_val)
+        test_pool = self._make_pool(X_test, y_test)
 
-        # Обучение модели
+        # Обучение модели, категориальные признаки заданы в пулах
         self.model = CatBoostRegressor(
             iterations=1000,
             learning_rate=0.1,
@@ -146,28 +208,39 @@ class PricingModelTrainer:
             loss_function="RMSE",
             random_seed=42,
             verbose=False,
-            cat_features=cat_features,
             # Отключаем создание catboost_info директории в Docker
             allow_writing_files=False,
+            **self._device_params(),
         )
 
-        self.model.fit(X_train, y_train)
+        # Лучшая итерация выбирается по валидационному пулу: деревья после нее
+        # отбрасываются, и модель меньше и быстрее на инференсе
+        self.model.fit(
+            train_pool,
+            eval_set=val_pool,
+            use_best_model=True,
+            early_stopping_rounds=50,
+        )
 
-        # Сохраняем важность признаков
-        feature_importance = dict(zip(X_train.columns, self.model.feature_importances_))
-        self.metrics.feature_importance = feature_importance
+        # Сохраняем важность признаков: самые важные, по убыванию важности
+        importances = self.model.feature_importances_
+        feature_names = train_pool.get_feature_names()
+        top_k = np.argsort(importances)[::-1][:FEATURE_IMPORTANCE_TOP_K]
+        self.metrics.feature_importance = {
+            feature_names[i]: float(importances[i]) for i in top_k
+        }
 
         # Считаем метрики
-        y_train_pred = self.model.predict(X_train)
-        y_test_pred = self.model.predict(X_test)
+        y_train_pred = self.model.predict(train_pool)
+        y_test_pred = self.model.predict(test_pool)
 
         self.metrics.metrics["train"]["rmse"] = float(
-            np.sqrt(mean_squared_error(y_train, y_train_pred))
+            np.sqrt(mean_squared_error(y_fit, y_train_pred))
         )
         self.metrics.metrics["train"]["mae"] = float(
-            mean_absolute_error(y_train, y_train_pred)
+            mean_absolute_error(y_fit, y_train_pred)
         )
-        self.metrics.metrics["train"]["r2"] = float(r2_score(y_train, y_train_pred))
+        self.metrics.metrics["train"]["r2"] = float(r2_score(y_fit, y_train_pred))
 
         self.metrics.metrics["test"]["rmse"] = float(
             np.sqrt(mean_squared_error(y_test, y_test_pred))
@@ -186,23 +259,37 @@ class PricingModelTrainer:
             raise RuntimeError("Модель не была создана")
         self.model.save_model(self.model_path)
         self.metrics.save(self.metrics_path)
-        
-        # Автоматически обновляем DVC и загружаем в MinIO
+
+        # Автоматически обновляем DVC и загружаем в MinIO в фоне: загрузка
+        # упирается в сеть и не должна задерживать вызывающий код. Поток не
+        # daemon, поэтому процесс дождется загрузки перед выходом
         if dvc_available:
-            try:
-                logger.info("🔄 Обновляем модели в DVC и загружаем в MinIO...")
-                repo = Repo(".")
-                
-                # Добавляем изменения в DVC
-                repo.add("models")
-                logger.info("✅ Модели добавлены в DVC")
-                
-                # Загружаем в remote storage
-                repo.push("models.dvc")
-                logger.info("✅ Модели успешно загружены в MinIO")
-                
-            except Exception as e:
-                logger.warning(f"⚠️  Ошибка обновления DVC: {e}")
-                logger.info("📁 Модели сохранены локально")
+            self._publish_thread = threading.Thread(
+                target=self._publish_to_dvc, name="dvc-publish"
+            )
+            self._publish_thread.start()
         else:
             logger.warning("⚠️  DVC недоступен, модели сохранены только локально")
+
+    def wait_for_publish(self, timeout: Optional[float] = None) -> None:
+        """Ожидание завершения фоновой загрузки моделей в DVC."""
+        if self._publish_thread is not None:
+            self._publish_thread.join(timeout)
+
+    def _publish_to_dvc(self) -> None:
+        """Добавление моделей в DVC и загрузка в MinIO."""
+        try:
+            logger.info("🔄 Обновляем модели в DVC и загружаем в MinIO...")
+            repo = Repo(".")
+
+            # Добавляем изменения в DVC
+            repo.add("models")
+            logger.info("✅ Модели добавлены в DVC")
+
+            # Загружаем в remote storage
+            repo.push("models.dvc")
+            logger.info("✅ Модели успешно загружены в MinIO")
+
+        except Exception as e:
+            logger.warning(f"⚠️  Ошибка обновления DVC: {e}")
+            logger.info("📁 Модели сохранены локально")
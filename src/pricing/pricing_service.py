@@ -2,17 +2,19 @@
 Заменяет LLMService из оригинальной архитектуры.
 """
 
-import pickle  # nosec B403
-import re
+import asyncio
+import functools
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
+import joblib
 import numpy as np
 import pandas as pd
-from sklearn.preprocessing import LabelEncoder
 
 try:
-    from catboost import CatBoostRegressor
+    from catboost import CatBoostRegressor, FeaturesData
 
     catboost_available = True
 except ImportError:
@@ -20,6 +22,7 @@ except ImportError:
 
 try:
     from dvc.repo import Repo
+
     dvc_available = True
 except ImportError:
     dvc_available = False
@@ -31,6 +34,69 @@ from base.config import (
     get_model_path,
     get_preprocessing_path,
 )
+from pricing.features import BASE_FEATURES, RAW_COLUMNS, build_features
+
+# Общий пул потоков для предсказаний. CatBoost ограничивает число разных
+# потоков, вызывавших модель, поэтому потоки не должны пересоздаваться вместе
+# с event loop, как у пула по умолчанию
+_INFERENCE_EXECUTOR = ThreadPoolExecutor(thread_name_prefix="pricing-inference")
+
+
+def _mtime_ns(path: Path) -> Optional[int]:
+    """Время изменения файла, None если файла нет."""
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+@functools.lru_cache(maxsize=4)
+def _load_artifacts(
+    model_path: str,
+    preprocessing_path: str,
+    model_mtime_ns: Optional[int],
+    preprocessing_mtime_ns: Optional[int],
+) -> Tuple[Any, Any, str]:
+    """Загрузка модели, pipeline и версии модели.
+
+    Результат кэшируется по путям и времени изменения файлов: экземпляры
+    сервиса в процессе делят одну модель, а новый файл модели загружается
+    заново. Время изменения передается только как часть ключа кэша.
+    """
+    model = None
+    if model_mtime_ns is not None and catboost_available:
+        try:
+            model = CatBoostRegressor()
+            model.load_model(model_path)
+            print(f"✅ Модель загружена из {model_path}")
+        except Exception as e:
+            print(f"❌ Ошибка загрузки модели: {e}")
+            model = None
+    else:
+        print(f"❌ Модель не найдена по пути {model_path} или CatBoost недоступен")
+
+    pipeline = None
+    if preprocessing_mtime_ns is not None:
+        try:
+            # Массивы numpy pipeline отображаются в память и делятся между
+            # процессами, как в ML воркерах
+            pipeline = joblib.load(preprocessing_path, mmap_mode="r")  # nosec B301
+            print(f"✅ Pipeline предобработки загружен из {preprocessing_path}")
+        except Exception as e:
+            print(f"❌ Ошибка загрузки pipeline: {e}")
+            pipeline = None
+    else:
+        print(f"❌ Pipeline не найден по пути {preprocessing_path}")
+
+    model_version = ""
+    if model is not None and pipeline is not None:
+        # Версия модели - хэш файлов модели и pipeline
+        digest = hashlib.sha256()
+        for path in (model_path, preprocessing_path):
+            digest.update(Path(path).read_bytes())
+        model_version = digest.hexdigest()[:12]
+
+    return model, pipeline, model_version
 
 
 class PricingService:
@@ -46,6 +112,7 @@ class PricingService:
 
         self.model = None
         self.preprocessing_pipeline = None
+        self.model_version = ""
         self._load_model_and_pipeline()
 
     def _load_model_and_pipeline(self) -> None:
@@ -62,141 +129,53 @@ class PricingService:
                 print("📁 Продолжаем с локальными файлами...")
         else:
             print("⚠️  DVC недоступен, используем локальные файлы")
-        
-        # Загружаем модель
-        if self.model_path.exists() and catboost_available:
-            try:
-                self.model = CatBoostRegressor()
-                self.model.load_model(str(self.model_path))
-                print(f"✅ Модель загружена из {self.model_path}")
-            except Exception as e:
-                print(f"❌ Ошибка загрузки модели: {e}")
-                self.model = None
-        else:
-            print(
-                f"❌ Модель не найдена по пути {self.model_path} или CatBoost недоступен"
-            )
-            self.model = None
-
-        # Загружаем pipeline предобработки
-        if self.preprocessing_path.exists():
-            try:
-                with open(self.preprocessing_path, "rb") as f:
-                    self.preprocessing_pipeline = pickle.load(f)  # nosec B301
-                print(f"✅ Pipeline предобработки загружен из {self.preprocessing_path}")
-            except Exception as e:
-                print(f"❌ Ошибка загрузки pipeline: {e}")
-                self.preprocessing_pipeline = None
-        else:
-            print(f"❌ Pipeline не найден по пути {self.preprocessing_path}")
-            self.preprocessing_pipeline = None
 
-    def _preprocess_single_item(
-        self, product_data: Dict[str, Any]
-    ) -> Optional[pd.DataFrame]:
-        """Предобработка одного товара для предсказания."""
+        # Модель и pipeline загружаются один раз на процесс и версию файлов
+        (
+            self.model,
+            self.preprocessing_pipeline,
+            self.model_version,
+        ) = _load_artifacts(
+            str(self.model_path),
+            str(self.preprocessing_path),
+            _mtime_ns(self.model_path),
+            _mtime_ns(self.preprocessing_path),
+        )
+
+    def _preprocess_items(
+        self, products: List[Dict[str, Any]]
+    ) -> Optional[Tuple[List[Dict[str, Any]], np.ndarray]]:
+        """Предобработка пачки товаров для предсказания.
+
+        Возвращает базовые признаки каждого товара (для оценки уверенности) и
+        матрицу признаков модели float32 в том же порядке столбцов, что и при
+        обучении. Признаки строятся тем же кодом, что и в ML воркерах.
+        """
         if self.preprocessing_pipeline is None:
             raise ValueError("Pipeline предобработки не загружен")
 
         try:
-            # Создаем DataFrame с одной записью
-            df = pd.DataFrame([product_data])
-
-            # Заполняем пропуски как в обучении
-            df["category_name"] = df["category_name"].fillna("Other")
-            df["brand_name"] = df["brand_name"].fillna("Unknown")
-            df["item_description"] = df["item_description"].fillna("")
-
-            # Создаем те же признаки что и при обучении
-            df["desc_len"] = df["item_description"].str.len()
-            df["name_len"] = df["name"].str.len()
-            df["has_brand"] = (df["brand_name"] != "Unknown").astype(int)
-            df["has_description"] = (df["item_description"] != "").astype(int)
-
-            # Разбиение категории на уровни (упрощенное)
-            df["cat_main"] = df["category_name"].apply(
-                lambda x: x.split("/")[0] if "/" in x else x
-            )
-            df["cat_sub"] = df["category_name"].apply(
-                lambda x: x.split("/")[1]
-                if "/" in x and len(x.split("/")) > 1
-                else "None"
-            )
-
-            # Текстовые признаки
-            df["desc_words"] = df["item_description"].apply(
-                lambda x: len(re.findall(r"\w+", x))
-            )
-            df["name_words"] = df["name"].apply(lambda x: len(re.findall(r"\w+", x)))
-
-            # TF-IDF преобразования (упрощенные - 10 признаков)
-            tfidf_name_features = (
-                self.preprocessing_pipeline["tfidf_name"]
-                .transform(df["name"])
-                .toarray()
-            )
-            tfidf_desc_features = (
-                self.preprocessing_pipeline["tfidf_desc"]
-                .transform(df["item_description"])
-                .toarray()
+            # Один DataFrame на всю пачку, собранный по колонкам
+            df = pd.DataFrame(
+                {
+                    column: [product.get(column) for product in products]
+                    for column in RAW_COLUMNS
+                }
             )
+            X = build_features(df, self.preprocessing_pipeline)
 
-            tfidf_name_df = pd.DataFrame(
-                tfidf_name_features, columns=[f"name_tfidf_{i}" for i in range(10)]
-            )
-            tfidf_desc_df = pd.DataFrame(
-                tfidf_desc_features, columns=[f"desc_tfidf_{i}" for i in range(10)]
-            )
-
-            # Кодирование категориальных признаков
-            df["brand_enc"] = self._safe_transform(
-                self.preprocessing_pipeline["le_brand"], df["brand_name"]
-            )
-            df["cat_main_enc"] = self._safe_transform(
-                self.preprocessing_pipeline["le_cat_main"], df["cat_main"]
-            )
-            df["cat_sub_enc"] = self._safe_transform(
-                self.preprocessing_pipeline["le_cat_sub"], df["cat_sub"]
-            )
-
-            # Собираем финальные признаки (упрощенные)
-            feature_cols = [
-                "item_condition_id",
-                "shipping",
-                "brand_enc",
-                "cat_main_enc",
-                "cat_sub_enc",
-                "desc_len",
-                "name_len",
-                "has_brand",
-                "has_description",
-                "desc_words",
-                "name_words",
+            features = [
+                dict(zip(BASE_FEATURES, row))
+                for row in X[:, : len(BASE_FEATURES)].tolist()
             ]
-
-            X_base = df[feature_cols].reset_index(drop=True)
-            X = pd.concat([X_base, tfidf_name_df, tfidf_desc_df], axis=1)
-
-            return X
+            return features, X
 
         except Exception as e:
-            print(f"Ошибка предобработки товара: {e}")
+            print(f"Ошибка предобработки товаров: {e}")
             return None
 
-    def _safe_transform(self, encoder: LabelEncoder, values: pd.Series) -> pd.Series:
-        """Безопасное преобразование с обработкой неизвестных категорий."""
-        try:
-            return encoder.transform(values)
-        except ValueError:
-            # Если встретили неизвестную категорию, заменяем на наиболее частую
-            known_classes = set(encoder.classes_)
-            values_safe = values.apply(
-                lambda x: x if x in known_classes else encoder.classes_[0]
-            )
-            return encoder.transform(values_safe)
-
     def _calculate_confidence_score(
-        self, prediction: float, features: pd.DataFrame
+        self, prediction: float, features: Dict[str, Any]
     ) -> float:
         """Расчет оценки уверенности модели в предсказании."""
         # Простая эвристика уверенности на основе:
@@ -207,15 +186,15 @@ class PricingService:
         confidence = 0.5  # базовая уверенность
 
         # Бонус за наличие бренда
-        if features["has_brand"].iloc[0] == 1:
+        if features["has_brand"] == 1:
             confidence += 0.15
 
         # Бонус за наличие описания
-        if features["has_description"].iloc[0] == 1:
+        if features["has_description"] == 1:
             confidence += 0.1
 
         # Бонус за длину описания
-        desc_len = features["desc_len"].iloc[0]
+        desc_len = features["desc_len"]
         if desc_len > 50:
             confidence += 0.1
         elif desc_len > 20:
@@ -263,32 +242,71 @@ class PricingService:
 
         return analysis
 
+    def _predict_log_prices(
+        self, products: List[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+        """Предобработка товаров и предсказание цен в log-scale.
+
+        Возвращает базовые признаки каждого товара и предсказания. Модель
+        вызывается один раз на всю пачку.
+        """
+        preprocessed = self._preprocess_items(products)
+        if preprocessed is None:
+            raise ValueError("Ошибка предобработки данных")
+        features, X = preprocessed
+
+        # Модель обучена на log-scale. FeaturesData передает float32 матрицу
+        # в CatBoost без промежуточного преобразования
+        return features, self.model.predict(FeaturesData(num_feature_data=X))
+
     async def predict_price(self, product_data: Dict[str, Any]) -> Dict[str, Any]:
         """Главный метод для прогнозирования цены товара."""
+        results = await self.predict_price_batch([product_data])
+        return results[0]
+
+    def predict_prices(self, products: List[Dict[str, Any]]) -> List[float]:
+        """Синхронное прогнозирование цен пачки товаров, только цены."""
+        if not products:
+            return []
         if self.model is None:
-            return {
-                "error": "Модель не загружена",
-                "predicted_price": 0.0,
-                "confidence_score": 0.0,
-                "price_range": {"min": 0.0, "max": 0.0},
-                "category_analysis": {"error": "Модель недоступна"},
-            }
+            raise ValueError("Модель не загружена")
 
-        try:
-            # Предобработка данных
-            X = self._preprocess_single_item(product_data)
-            if X is None:
-                raise ValueError("Ошибка предобработки данных")
+        _, log_predictions = self._predict_log_prices(products)
+        return [
+            max(self.min_price, min(prediction, self.max_price))
+            for prediction in np.expm1(log_predictions).tolist()
+        ]
 
-            # Предсказание (модель обучена на log-scale)
-            log_prediction = self.model.predict(X)[0]
-            prediction = float(np.expm1(log_prediction))  # Обратное логарифмирование
+    @staticmethod
+    def _error_result(message: str, analysis_error: str) -> Dict[str, Any]:
+        """Результат прогноза для товара, цену которого получить не удалось."""
+        return {
+            "error": message,
+            "predicted_price": 0.0,
+            "confidence_score": 0.0,
+            "price_range": {"min": 0.0, "max": 0.0},
+            "category_analysis": {"error": analysis_error},
+        }
 
+    def _predict_results(
+        self, products: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Прогноз пачки товаров одним вызовом модели с разбором результатов."""
+        features, log_predictions = self._predict_log_prices(products)
+        # Обратное логарифмирование
+        predictions = np.expm1(log_predictions).tolist()
+
+        results = []
+        for product_data, item_features, prediction in zip(
+            products, features, predictions
+        ):
             # Ограничиваем предсказание разумными рамками
             prediction = max(self.min_price, min(prediction, self.max_price))
 
             # Расчет уверенности
-            confidence_score = self._calculate_confidence_score(prediction, X)
+            confidence_score = self._calculate_confidence_score(
+                prediction, item_features
+            )
 
             # Расчет диапазона цен (± 30% от предсказания)
             price_range = {
@@ -299,25 +317,68 @@ class PricingService:
             # Анализ категории
             category_analysis = self._get_category_analysis(product_data, prediction)
 
-            return {
-                "predicted_price": round(prediction, 2),
-                "confidence_score": round(confidence_score, 3),
-                "price_range": {
-                    "min": round(price_range["min"], 2),
-                    "max": round(price_range["max"], 2),
-                },
-                "category_analysis": category_analysis,
-            }
+            results.append(
+                {
+                    "predicted_price": round(prediction, 2),
+                    "confidence_score": round(confidence_score, 3),
+                    "price_range": {
+                        "min": round(price_range["min"], 2),
+                        "max": round(price_range["max"], 2),
+                    },
+                    "category_analysis": category_analysis,
+                }
+            )
+        return results
+
+    def _predict_results_isolated(
+        self, products: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Прогноз пачки с откатом на поштучный прогноз при ошибке.
 
+        Ошибку получают только товары, на которых падает прогноз, остальные
+        товары пачки прогнозируются как обычно.
+        """
+        try:
+            return self._predict_results(products)
         except Exception as e:
             print(f"Ошибка предсказания цены: {e}")
-            return {
-                "error": str(e),
-                "predicted_price": 0.0,
-                "confidence_score": 0.0,
-                "price_range": {"min": 0.0, "max": 0.0},
-                "category_analysis": {"error": "Ошибка обработки"},
-            }
+            if len(products) == 1:
+                return [self._error_result(str(e), "Ошибка обработки")]
+
+        # Изолируем товары, из-за которых упала пачка
+        results = []
+        for product_data in products:
+            try:
+                results.extend(self._predict_results([product_data]))
+            except Exception as e:
+                print(f"Ошибка предсказания цены товара: {e}")
+                results.append(self._error_result(str(e), "Ошибка обработки"))
+        return results
+
+    async def predict_price_batch(
+        self, products: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """Прогнозирование цен для пачки товаров одним вызовом модели."""
+        if not products:
+            return []
+
+        if self.model is None:
+            return [
+                self._error_result("Модель не загружена", "Модель недоступна")
+                for _ in products
+            ]
+
+        try:
+            # Предобработка и предсказание нагружают CPU, выполняем их вне
+            # event loop, чтобы не блокировать остальные запросы
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                _INFERENCE_EXECUTOR, self._predict_results_isolated, products
+            )
+
+        except Exception as e:
+            print(f"Ошибка предсказания цены: {e}")
+            return [self._error_result(str(e), "Ошибка обработки") for _ in products]
 
     def get_model_info(self) -> Dict[str, Any]:
         """Получение информации о загруженной модели."""
@@ -1,13 +1,16 @@
 """Быстрое обучение модели для демонстрации.
 """
 
-import pickle  # nosec B403
+import hashlib
+import os
 import re
 import warnings
 from pathlib import Path
 
+import joblib
 import numpy as np
 import pandas as pd
+from scipy import sparse
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics import mean_squared_error
 from sklearn.model_selection import train_test_split
@@ -15,8 +18,38 @@ from sklearn.preprocessing import LabelEncoder
 
 warnings.filterwarnings("ignore")
 
+# Слово для подсчета слов в тексте
+_WORD_PATTERN = re.compile(r"\w+")
+
+# Кэш признаков; версию нужно увеличивать при изменении построения признаков
+_CACHE_DIR = Path(".cache/quick_train")
+_FEATURES_VERSION = 3
+# Сколько последних наборов признаков хранить в кэше
+_CACHE_MAX_ENTRIES = 5
+
+# Колонки train.tsv, которые используются для обучения
+_RAW_COLUMNS = [
+    "name",
+    "item_condition_id",
+    "category_name",
+    "brand_name",
+    "price",
+    "shipping",
+    "item_description",
+]
+_RAW_DTYPES = {
+    "name": "object",
+    "item_condition_id": "int8",
+    "category_name": "object",
+    "brand_name": "object",
+    "price": "float64",
+    "shipping": "int8",
+    "item_description": "object",
+}
+
 try:
-    from catboost import CatBoostRegressor
+    from catboost import CatBoostRegressor, Pool
+    from catboost.utils import get_gpu_device_count
 
     catboost_available = True
 except ImportError:
@@ -30,25 +63,27 @@ except ImportError:
     dvc_available = False
 
 
-def quick_train_model():
-    """Быстрое обучение модели на малой выборке."""
-    print("🚀 Быстрое обучение модели ценообразования...")
+def _fit_label_encoder(values: pd.Series):
+    """Кодирование значений за один проход pd.factorize.
 
-    # Проверяем наличие данных
-    data_path = "data/train.tsv"
-    if not Path(data_path).exists():
-        print(f"❌ Файл данных не найден: {data_path}")
-        return False
+    Коды и classes_ совпадают с LabelEncoder.fit_transform, поэтому pipeline
+    остается совместимым с сервисом и воркерами.
+    """
+    codes, uniques = pd.factorize(values, sort=True)
+    encoder = LabelEncoder()
+    # Строки фиксированной длины хранятся одним буфером numpy: joblib пишет
+    # его без pickle объектов, и воркеры отображают его в память
+    encoder.classes_ = np.asarray(uniques, dtype=str)
+    return codes.astype(np.int32), encoder
 
-    # Загружаем маленькую выборку
-    print("📊 Загрузка данных...")
-    df = pd.read_csv(data_path, sep="\t", nrows=5000)  # Только 5000 записей
 
-    # Быстрая очистка
-    df = df[df["price"] > 0].copy()
-    df["category_name"] = df["category_name"].fillna("Other")
-    df["brand_name"] = df["brand_name"].fillna("Unknown")
-    df["item_description"] = df["item_description"].fillna("")
+def _build_features(df):
+    """Очистка данных, построение признаков и обучение предобработки."""
+    # Быстрая очистка: fillna возвращает новый DataFrame, поэтому отдельная
+    # копия отфильтрованных строк не нужна
+    df = df[df["price"] > 0].fillna(
+        {"category_name": "Other", "brand_name": "Unknown", "item_description": ""}
+    )
 
     print(f"✅ Загружено {len(df)} записей")
 
@@ -60,34 +95,39 @@ def quick_train_model():
     df["has_description"] = (df["item_description"] != "").astype(int)
 
     # Разбиение категории
-    df["cat_main"] = df["category_name"].apply(
-        lambda x: x.split("/")[0] if "/" in x else x
-    )
-    df["cat_sub"] = df["category_name"].apply(
-        lambda x: x.split("/")[1] if "/" in x and len(x.split("/")) > 1 else "None"
-    )
+    # Один проход по строкам: строковые методы pandas для object-колонок
+    # медленнее простого цикла
+    cat_main, cat_sub = [], []
+    for category in df["category_name"].tolist():
+        main, sep, rest = category.partition("/")
+        cat_main.append(main)
+        cat_sub.append(rest.partition("/")[0] if sep else "None")
+    df["cat_main"] = cat_main
+    df["cat_sub"] = cat_sub
 
     # Текстовые признаки
-    df["desc_words"] = df["item_description"].apply(
-        lambda x: len(re.findall(r"\w+", x))
-    )
-    df["name_words"] = df["name"].apply(lambda x: len(re.findall(r"\w+", x)))
+    df["desc_words"] = [
+        len(_WORD_PATTERN.findall(text)) for text in df["item_description"].tolist()
+    ]
+    df["name_words"] = [
+        len(_WORD_PATTERN.findall(text)) for text in df["name"].tolist()
+    ]
 
-    # TF-IDF (упрощенный)
-    tfidf_name = TfidfVectorizer(max_features=10, stop_words="english", lowercase=True)
-    tfidf_desc = TfidfVectorizer(max_features=10, stop_words="english", lowercase=True)
+    # TF-IDF (упрощенный), сразу в float32 - CatBoost все равно хранит float32
+    tfidf_name = TfidfVectorizer(
+        max_features=10, stop_words="english", lowercase=True, dtype=np.float32
+    )
+    tfidf_desc = TfidfVectorizer(
+        max_features=10, stop_words="english", lowercase=True, dtype=np.float32
+    )
 
-    tfidf_name_features = tfidf_name.fit_transform(df["name"]).toarray()
-    tfidf_desc_features = tfidf_desc.fit_transform(df["item_description"]).toarray()
+    tfidf_name_features = tfidf_name.fit_transform(df["name"])
+    tfidf_desc_features = tfidf_desc.fit_transform(df["item_description"])
 
     # Label encoding
-    le_brand = LabelEncoder()
-    le_cat_main = LabelEncoder()
-    le_cat_sub = LabelEncoder()
-
-    df["brand_enc"] = le_brand.fit_transform(df["brand_name"])
-    df["cat_main_enc"] = le_cat_main.fit_transform(df["cat_main"])
-    df["cat_sub_enc"] = le_cat_sub.fit_transform(df["cat_sub"])
+    df["brand_enc"], le_brand = _fit_label_encoder(df["brand_name"])
+    df["cat_main_enc"], le_cat_main = _fit_label_encoder(df["cat_main"])
+    df["cat_sub_enc"], le_cat_sub = _fit_label_encoder(df["cat_sub"])
 
     # Собираем признаки
     feature_cols = [
@@ -104,18 +144,113 @@ def quick_train_model():
         "name_words",
     ]
 
-    X_base = df[feature_cols]
+    feature_names = (
+        feature_cols
+        + [f"name_tfidf_{i}" for i in range(10)]
+        + [f"desc_tfidf_{i}" for i in range(10)]
+    )
 
-    # Добавляем TF-IDF
-    tfidf_name_df = pd.DataFrame(
-        tfidf_name_features, columns=[f"name_tfidf_{i}" for i in range(10)]
+    # Базовые признаки копируются сразу в одну матрицу float32, без
+    # промежуточного DataFrame из выбранных колонок
+    X_base = np.empty((len(df), len(feature_cols)), dtype=np.float32)
+    for i, col in enumerate(feature_cols):
+        X_base[:, i] = df[col].to_numpy()
+
+    # Добавляем TF-IDF, матрица остается разреженной
+    X = sparse.hstack(
+        [
+            sparse.csr_matrix(X_base),
+            tfidf_name_features,
+            tfidf_desc_features,
+        ],
+        format="csr",
+        dtype=np.float32,
     )
-    tfidf_desc_df = pd.DataFrame(
-        tfidf_desc_features, columns=[f"desc_tfidf_{i}" for i in range(10)]
+    y = np.log1p(df["price"].to_numpy())
+
+    preprocessing_pipeline = {
+        "tfidf_name": tfidf_name,
+        "tfidf_desc": tfidf_desc,
+        "le_brand": le_brand,
+        "le_cat_main": le_cat_main,
+        "le_cat_sub": le_cat_sub,
+        "feature_columns": feature_names,
+    }
+    return X, y, preprocessing_pipeline
+
+
+def _load_features(data_path: str, nrows: int):
+    """Загрузка признаков с кэшированием на диске.
+
+    Ключ кэша - путь, время изменения и размер файла данных и число строк,
+    поэтому повторное обучение на тех же данных не строит признаки заново.
+    """
+    stat = Path(data_path).stat()
+    key_source = (
+        f"{_FEATURES_VERSION}:{data_path}:{stat.st_mtime_ns}:{stat.st_size}:{nrows}"
     )
+    key = hashlib.sha1(key_source.encode()).hexdigest()
+    cache_path = _CACHE_DIR / f"{key}.joblib"
+    if cache_path.exists():
+        print(f"♻️  Признаки загружены из кэша: {cache_path}")
+        # Обновляем время изменения: по нему вытесняются давно не нужные записи
+        cache_path.touch()
+        return joblib.load(cache_path)
 
-    X = pd.concat([X_base.reset_index(drop=True), tfidf_name_df, tfidf_desc_df], axis=1)
-    y = np.log1p(df["price"])
+    # Загружаем маленькую выборку
+    print("📊 Загрузка данных...")
+    # Только нужные колонки с явными типами; движок pyarrow не поддерживает
+    # nrows и прочитал бы весь файл ради первых строк
+    df = pd.read_csv(
+        data_path,
+        sep="\t",
+        nrows=nrows,
+        usecols=_RAW_COLUMNS,
+        dtype=_RAW_DTYPES,
+    )
+
+    features = _build_features(df)
+
+    _CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    joblib.dump(features, cache_path)
+    _evict_old_features()
+    return features
+
+
+def _evict_old_features() -> None:
+    """Удаление самых старых записей кэша сверх _CACHE_MAX_ENTRIES."""
+    entries = sorted(
+        _CACHE_DIR.glob("*.joblib"), key=lambda path: path.stat().st_mtime_ns
+    )
+    for path in entries[:-_CACHE_MAX_ENTRIES]:
+        path.unlink(missing_ok=True)
+
+
+def _device_params():
+    """Параметры устройства обучения: GPU, если он доступен, иначе CPU.
+
+    Как и в PricingModelTrainer, PRICING_USE_GPU=0 принудительно включает
+    обучение на CPU.
+    """
+    if os.getenv("PRICING_USE_GPU", "1") != "0" and get_gpu_device_count() > 0:
+        print("🖥️  Обучение на GPU")
+        # 32 границы - рекомендуемое значение для GPU
+        return {"task_type": "GPU", "devices": "0", "border_count": 32}
+    return {"task_type": "CPU"}
+
+
+def quick_train_model():
+    """Быстрое обучение модели на малой выборке."""
+    print("🚀 Быстрое обучение модели ценообразования...")
+
+    # Проверяем наличие данных
+    data_path = "data/train.tsv"
+    if not Path(data_path).exists():
+        print(f"❌ Файл данных не найден: {data_path}")
+        return False
+
+    X, y, preprocessing_pipeline = _load_features(data_path, nrows=5000)
+    feature_names = preprocessing_pipeline["feature_columns"]
 
     print(f"📈 Размер матрицы признаков: {X.shape}")
 
@@ -132,13 +267,22 @@ def quick_train_model():
 
     # Быстрая модель
     model = CatBoostRegressor(
-        iterations=50, depth=4, learning_rate=0.2, random_state=42, verbose=10
+        iterations=50,
+        depth=4,
+        learning_rate=0.2,
+        random_state=42,
+        verbose=10,
+        # Отключаем создание catboost_info директории
+        allow_writing_files=False,
+        **_device_params(),
     )
 
-    model.fit(X_train, y_train, eval_set=(X_test, y_test))
+    train_pool = Pool(X_train, label=y_train, feature_names=feature_names)
+    test_pool = Pool(X_test, label=y_test, feature_names=feature_names)
+    model.fit(train_pool, eval_set=test_pool)
 
     # Проверка качества
-    test_pred = model.predict(X_test)
+    test_pred = model.predict(test_pool)
     test_pred_exp = np.expm1(test_pred)
     y_test_exp = np.expm1(y_test)
 
@@ -155,19 +299,8 @@ def quick_train_model():
     model.save_model("models/catboost_pricing_model.cbm")
 
     # Сохраняем pipeline
-    preprocessing_pipeline = {
-        "tfidf_name": tfidf_name,
-        "tfidf_desc": tfidf_desc,
-        "le_brand": le_brand,
-        "le_cat_main": le_cat_main,
-        "le_cat_sub": le_cat_sub,
-        "feature_columns": feature_cols
-        + [f"name_tfidf_{i}" for i in range(10)]
-        + [f"desc_tfidf_{i}" for i in range(10)],
-    }
-
-    with open("models/preprocessing_pipeline.pkl", "wb") as f:
-        pickle.dump(preprocessing_pipeline, f)
+    # joblib хранит массивы numpy отдельно, воркеры отображают их в память
+    joblib.dump(preprocessing_pipeline, "models/preprocessing_pipeline.pkl")
 
     print("✅ Модель успешно обучена и сохранена!")
     print("📁 Модель: models/catboost_pricing_model.cbm")
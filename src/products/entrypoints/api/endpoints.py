@@ -7,7 +7,7 @@ import tempfile
 from typing import Annotated, List
 
 import pandas as pd
-from fastapi import APIRouter, Depends, HTTPException, UploadFile
+from fastapi import APIRouter, Depends, HTTPException, Response, UploadFile
 from fastapi.responses import FileResponse
 
 from base.data_structures import JWTPayloadDTO
@@ -161,19 +161,19 @@ async def delete_product(
 @router.post("/pricing/predict/", response_model=PricingResponse)
 async def predict_price(
     request: PricingRequest,
+    response: Response,
     service: ProductServiceDependency,
     token: JWTPayloadDTO = Depends(get_token_from_header),
 ) -> PricingResponse:
     """Прогнозирование цены для товара."""
     try:
-        # Используем MLPricingService напрямую для получения прогноза
-        from products.services.services import MLPricingService
-        ml_service = MLPricingService()
-        
-        # Получаем прогноз цены
-        prediction = await ml_service.get_price_prediction(request.product_data)
+        # Получаем прогноз цены, повторный запрос того же товара - из кэша
+        [(prediction, is_hit)] = await ml_service.get_price_predictions(
+            [request.product_data]
+        )
+        response.headers["X-Cache"] = "HIT" if is_hit else "MISS"
         return prediction
-        
+
     except (AuthenticationError, AuthorizationError) as e:
         raise HTTPException(status_code=403, detail=str(e))
     except TaskQueueError as e:
@@ -189,6 +189,7 @@ async def predict_price(
 @router.post("/pricing/predict-multiple/", status_code=200)
 async def predict_price_multiple(
     product_ids: List[int],
+    response: Response,
     data_from_token: Annotated[JWTPayloadDTO, Depends(get_token_from_header)],
     service: ProductServiceDependency,
 ):
@@ -238,28 +239,33 @@ async def predict_price_multiple(
         if not billing_response.success:
             raise HTTPException(status_code=500, detail=billing_response.message)
 
-        # Получаем прогнозы для всех товаров
-        results = []
-        for product_id in product_ids:
-            product = next(p for p in user_products if p.id == product_id)
-
-            product_data = ProductData(
-                name=product.name,
-                item_description=product.item_description,
-                category_name=product.category_name,
-                brand_name=product.brand_name,
-                item_condition_id=product.item_condition_id,
-                shipping=product.shipping,
-            )
-
-            prediction = await ml_service.get_price_prediction(product_data)
-            results.append(
-                {
-                    "product_id": product_id,
-                    "product_name": product.name,
-                    "prediction": prediction,
-                }
-            )
+        # Получаем прогнозы для всех товаров одним обращением к кэшу
+        products_by_id = {p.id: p for p in user_products}
+        products = [products_by_id[product_id] for product_id in product_ids]
+        predictions = await ml_service.get_price_predictions(
+            [
+                ProductData(
+                    name=product.name,
+                    item_description=product.item_description,
+                    category_name=product.category_name,
+                    brand_name=product.brand_name,
+                    item_condition_id=product.item_condition_id,
+                    shipping=product.shipping,
+                )
+                for product in products
+            ]
+        )
+        results = [
+            {
+                "product_id": product.id,
+                "product_name": product.name,
+                "prediction": prediction,
+            }
+            for product, (prediction, _) in zip(products, predictions)
+        ]
+        # HIT, только если все прогнозы взяты из кэша
+        all_hits = all(is_hit for _, is_hit in predictions)
+        response.headers["X-Cache"] = "HIT" if all_hits else "MISS"
 
         return {
             "message": f"Successfully predicted prices for {len(product_ids)} products",
@@ -1,8 +1,9 @@
 """Сервисы для работы с товарами и ценообразованием."""
 
-from typing import Any, Optional
+from typing import Any, List, Optional, Tuple
 
 from base.exceptions import DatabaseError, PermissionDeniedError, ProductNotFoundError
+from pricing.cache import get_prediction_cache
 from pricing.pricing_service import PricingService
 from products.domain.models import PricingResponse, Product, ProductData, Task
 from products.services.unit_of_work import ProductAbstractUnitOfWork
@@ -116,26 +117,74 @@ class MLPricingService:
         product_data: ProductData,
     ) -> PricingResponse:
         """Получить прогноз цены для товара."""
-        # Конвертируем ProductData в словарь для pricing_service
-        product_dict = {
-            "name": product_data.name,
-            "item_description": product_data.item_description,
-            "category_name": product_data.category_name,
-            "brand_name": product_data.brand_name,
-            "item_condition_id": product_data.item_condition_id,
-            "shipping": product_data.shipping,
-        }
-
-        # Получаем предсказание
-        prediction_result = await self.pricing_service.predict_price(product_dict)
+        results = await self.get_price_predictions([product_data])
+        return results[0][0]
 
-        # Конвертируем результат в PricingResponse
-        return PricingResponse(
-            predicted_price=prediction_result.get("predicted_price", 0.0),
-            confidence_score=prediction_result.get("confidence_score", 0.0),
-            price_range=prediction_result.get("price_range", {"min": 0.0, "max": 0.0}),
-            category_analysis=prediction_result.get("category_analysis", {}),
+    async def get_price_predictions(
+        self,
+        products: List[ProductData],
+    ) -> List[Tuple[PricingResponse, bool]]:
+        """Получить прогнозы цен для товаров.
+
+        Возвращает пары (прогноз, взят ли прогноз из кэша). Кэш читается и
+        пополняется одним запросом к Redis на весь список.
+        """
+        product_dicts = [
+            {
+                "name": product_data.name,
+                "item_description": product_data.item_description,
+                "category_name": product_data.category_name,
+                "brand_name": product_data.brand_name,
+                "item_condition_id": product_data.item_condition_id,
+                "shipping": product_data.shipping,
+            }
+            for product_data in products
+        ]
+
+        # Без загруженной модели кэшировать нечего
+        cache = get_prediction_cache() if self.pricing_service.model_version else None
+        if cache is None:
+            keys = []
+            cached = [None] * len(product_dicts)
+        else:
+            keys = [
+                cache.make_key(self.pricing_service.model_version, product_dict)
+                for product_dict in product_dicts
+            ]
+            cached = await cache.get_many(keys)
+
+        # Все товары без прогноза в кэше предсказываются одним вызовом модели
+        missing = [i for i, cached_result in enumerate(cached) if cached_result is None]
+        predicted = await self.pricing_service.predict_price_batch(
+            [product_dicts[i] for i in missing]
         )
+        prediction_results = list(cached)
+        new_entries = {}
+        for i, prediction_result in zip(missing, predicted):
+            prediction_results[i] = prediction_result
+            # Ошибки не кэшируем
+            if cache is not None and "error" not in prediction_result:
+                new_entries[keys[i]] = prediction_result
+
+        # Конвертируем результаты в PricingResponse
+        results = [
+            (
+                PricingResponse(
+                    predicted_price=prediction_result.get("predicted_price", 0.0),
+                    confidence_score=prediction_result.get("confidence_score", 0.0),
+                    price_range=prediction_result.get(
+                        "price_range", {"min": 0.0, "max": 0.0}
+                    ),
+                    category_analysis=prediction_result.get("category_analysis", {}),
+                ),
+                cached[i] is not None,
+            )
+            for i, prediction_result in enumerate(prediction_results)
+        ]
+
+        if new_entries:
+            await cache.set_many(new_entries)
+        return results
 
     async def get_only_price_info(
         self,
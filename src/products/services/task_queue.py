@@ -6,6 +6,7 @@ import time
 from datetime import datetime
 from typing import Any, Dict, Optional
 
+import msgpack
 import pika
 import redis
 from pika.exceptions import AMQPConnectionError
@@ -132,7 +133,8 @@ class TaskQueueService:
                 "attempts": 0,
             }
             if self.redis_client:
-                self.redis_client.rpush("pricing_tasks", json.dumps(task_data))
+                # Воркер читает задачи в msgpack: компактнее и быстрее разбирается
+                self.redis_client.rpush("pricing_tasks", msgpack.packb(task_data))
             logger.info(f"Task {task_id} added to queue")
         except Exception as e:
             logger.error(f"Failed to add task {task_id}: {e}")
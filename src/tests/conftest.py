@@ -1,6 +1,7 @@
 """Конфигурация тестов."""
 
 import os
+import time
 import warnings
 from datetime import datetime, timedelta, timezone
 from unittest.mock import AsyncMock, Mock
@@ -89,6 +90,19 @@ def mock_token():
     )
 
 
+@pytest.fixture
+def auth_override():
+    """Подменяет проверку JWT токена в приложении на фиксированный payload."""
+    from base.dependencies import get_token_from_header
+    from main import app
+
+    app.dependency_overrides[get_token_from_header] = lambda: JWTPayloadDTO(
+        id=1, exp=int(time.time()) + 1800, type="access"
+    )
+    yield
+    app.dependency_overrides.pop(get_token_from_header, None)
+
+
 @pytest.fixture
 def isolated_client():
     """Изолированный тестовый клиент с полностью замоканными зависимостями."""
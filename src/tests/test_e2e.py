@@ -92,6 +92,19 @@ class TestE2EEndpointsExist:
         assert tariffs["max_items_per_request"] > 0
         print("✅ Тарифная система работает корректно")
 
+    def test_readiness_follows_app_state(self, client):
+        """Тест readiness: 503 до завершения запуска, 200 после."""
+        app.state.ready = False
+        assert client.get("/readyz").status_code == 503
+
+        app.state.ready = True
+        try:
+            response = client.get("/readyz")
+            assert response.status_code == 200
+            assert response.json() == {"status": "ready"}
+        finally:
+            app.state.ready = False
+
     def test_calculate_cost_business_logic(self, client):
         """Тест реальной бизнес логики расчета стоимости."""
         # Получаем тарифы для расчетов
@@ -184,7 +197,7 @@ class TestE2EWithMockedAuth:
     """E2E тесты с простыми моками авторизации."""
 
     @pytest.fixture
-    def client(self):
+    def client(self, auth_override):
         return TestClient(app)
 
     def test_protected_endpoints_with_mock_auth(self, client):
@@ -3,6 +3,7 @@
 import json
 from unittest.mock import patch
 
+import msgpack
 import pytest
 import redis
 
@@ -307,7 +308,7 @@ class TestTaskQueueServiceIntegration:
             mock_rpush.assert_called_once()
             args = mock_rpush.call_args[0]
             assert args[0] == "pricing_tasks"
-            task_data = json.loads(args[1])
+            task_data = msgpack.unpackb(args[1], raw=False)
             assert task_data["task_id"] == task_id
             assert task_data["product_data"] == product_data
             assert "created_at" in task_data
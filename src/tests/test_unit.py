@@ -1,15 +1,19 @@
 """Unit тесты для всех компонентов проекта."""
 
+import hashlib
+import ipaddress
+import threading
 from datetime import datetime, timedelta, timezone
 from decimal import Decimal
 from unittest.mock import AsyncMock, Mock, patch
 
 import jwt
 import pytest
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.testclient import TestClient
 
 from base.data_structures import JWTPayloadDTO
+from base.dependencies import _jwt_cache, get_token_from_header
 from base.exception_handlers import add_exception_handlers
 from base.exceptions import (
     AppException,
@@ -24,6 +28,7 @@ from base.exceptions import (
     TaskQueueError,
     ValidationError,
 )
+from base.middleware import RateLimitMiddleware
 from base.utils import JWTHandler
 from products.adapters.orm import ProductORM, TaskORM
 
@@ -87,6 +92,10 @@ class TestExceptionHandlers:
         async def test_queue_exception():
             raise TaskQueueError("Test task queue error")
 
+        @app.get("/test/invalid-token-exception")
+        async def test_invalid_token_exception():
+            raise InvalidTokenException("Test invalid token")
+
         return app
 
     @pytest.fixture
@@ -121,7 +130,7 @@ class TestExceptionHandlers:
     def test_validation_exception_handler(self, client):
         """Тест обработчика ValidationError."""
         response = client.get("/test/validation-exception")
-        assert response.status_code == 400
+        assert response.status_code == 422
         data = response.json()
         assert data["detail"] == "Test validation error"
         assert data["type"] == "validation_error"
@@ -148,7 +157,7 @@ class TestExceptionHandlers:
         assert response.status_code == 403
         data = response.json()
         assert data["detail"] == "Test permission denied"
-        assert data["type"] == "permission_denied"
+        assert data["type"] == "permission_error"
 
     def test_funds_exception_handler(self, client):
         """Тест обработчика InsufficientFundsError."""
@@ -156,7 +165,7 @@ class TestExceptionHandlers:
         assert response.status_code == 402
         data = response.json()
         assert data["detail"] == "Test insufficient funds"
-        assert data["type"] == "insufficient_funds"
+        assert data["type"] == "insufficient_funds_error"
 
     def test_ml_exception_handler(self, client):
         """Тест обработчика MLServiceError."""
@@ -174,6 +183,14 @@ class TestExceptionHandlers:
         assert data["detail"] == "Test task queue error"
         assert data["type"] == "task_queue_error"
 
+    def test_subclass_dispatched_by_base_handler(self, client):
+        """Тест обработки подкласса без собственного обработчика."""
+        response = client.get("/test/invalid-token-exception")
+        assert response.status_code == 401
+        data = response.json()
+        assert data["detail"] == "Test invalid token"
+        assert data["type"] == "authentication_error"
+
 
 # =============================================================================
 # JWT UTILS TESTS
@@ -272,6 +289,28 @@ class TestJWTHandler:
             handler2.decode_token(token)
         assert "Invalid token" in str(excinfo.value)
 
+    def test_decode_token_tampered_signature(self, jwt_handler, user_id):
+        """Тест отклонения токена с измененной подписью."""
+        token = jwt_handler.create_access_token(user_id)
+        header, payload, signature = token.split(".")
+        tampered = f"{header}.{payload}.{signature[:-2]}AA"
+
+        with pytest.raises(InvalidTokenException) as excinfo:
+            jwt_handler.decode_token(tampered)
+        assert "Invalid token" in str(excinfo.value)
+
+    def test_decode_token_other_algorithm(self, jwt_handler, user_id):
+        """Тест отклонения токена, подписанного не HS256."""
+        expire_timestamp = int(
+            (datetime.now(timezone.utc) + timedelta(hours=1)).timestamp()
+        )
+        payload = {"id": user_id, "exp": expire_timestamp, "type": "access"}
+        token = jwt.encode(payload, jwt_handler.secret_key, algorithm="HS512")
+
+        with pytest.raises(InvalidTokenException) as excinfo:
+            jwt_handler.decode_token(token)
+        assert "Invalid token" in str(excinfo.value)
+
     def test_create_refresh_token(self, jwt_handler, user_id):
         """Тест создания refresh токена."""
         with patch("base.utils.settings.refresh_token_expires_hours", 24):
@@ -346,10 +385,12 @@ class TestJWTHandler:
 
     def test_decode_token_general_exception(self, jwt_handler):
         """Тест обработки общих исключений при декодировании токена."""
+        # Неожиданные ошибки не маскируются под невалидный токен
         with patch("jwt.decode", side_effect=Exception("Unexpected error")):
-            with pytest.raises(InvalidTokenException) as excinfo:
+            with pytest.raises(Exception) as excinfo:
                 jwt_handler.decode_token("any_token")
-            assert "Token decode error" in str(excinfo.value)
+            assert not isinstance(excinfo.value, InvalidTokenException)
+            assert "Unexpected error" in str(excinfo.value)
 
     def test_verify_refresh_token_general_exception(self, jwt_handler):
         """Тест обработки общих исключений при верификации refresh токена."""
@@ -359,6 +400,208 @@ class TestJWTHandler:
             assert "Refresh token verify error" in str(excinfo.value)
 
 
+# =============================================================================
+# AUTH DEPENDENCIES TESTS
+# =============================================================================
+
+
+class TestRateLimitMiddleware:
+    """Unit тесты для RateLimitMiddleware."""
+
+    @pytest.fixture
+    def limiter(self):
+        """Фикстура с маленьким лимитом для тестов."""
+        limiter = RateLimitMiddleware(app=None, shards=1)
+        limiter.max_requests = 3
+        limiter.window_size = 60
+        return limiter
+
+    def test_requests_within_limit(self, limiter):
+        """Тест пропуска запросов в пределах лимита."""
+        for _ in range(3):
+            assert limiter._is_rate_limited("1.2.3.4") is False
+
+    def test_requests_over_limit(self, limiter):
+        """Тест блокировки запросов сверх лимита."""
+        for _ in range(3):
+            limiter._is_rate_limited("1.2.3.4")
+        assert limiter._is_rate_limited("1.2.3.4") is True
+        # Другой IP не затронут
+        assert limiter._is_rate_limited("5.6.7.8") is False
+
+    def test_window_expiration(self, limiter):
+        """Тест сброса лимита после окончания окна."""
+        with patch("base.middleware.time.monotonic", return_value=1000.0):
+            for _ in range(4):
+                limiter._is_rate_limited("1.2.3.4")
+        with patch("base.middleware.time.monotonic", return_value=1060.0):
+            assert limiter._is_rate_limited("1.2.3.4") is False
+
+    def test_idle_ips_evicted(self, limiter):
+        """Тест удаления неактивных IP при периодической очистке."""
+        limiter.sweep_interval = 2
+        with patch("base.middleware.time.monotonic", return_value=1000.0):
+            limiter._is_rate_limited("1.2.3.4")
+        with patch("base.middleware.time.monotonic", return_value=1100.0):
+            limiter._is_rate_limited("5.6.7.8")
+        assert list(limiter._shards[0].entries) == ["5.6.7.8"]
+
+    def test_client_ip_from_forwarded_for(self, limiter):
+        """Тест получения IP клиента из X-Forwarded-For."""
+        limiter.trusted_proxies = [ipaddress.ip_network("172.18.0.2")]
+        scope = {
+            "headers": [(b"x-forwarded-for", b"6.6.6.6, 1.2.3.4")],
+            "client": ("172.18.0.2", 50000),
+        }
+        assert limiter._client_ip(scope) == "1.2.3.4"
+
+        scope["headers"] = []
+        assert limiter._client_ip(scope) == "172.18.0.2"
+
+    def test_spoofed_forwarded_for_ignored(self, limiter):
+        """Тест игнорирования X-Forwarded-For от недоверенного адреса."""
+        limiter.trusted_proxies = [ipaddress.ip_network("172.18.0.2")]
+        scope = {
+            "headers": [(b"x-forwarded-for", b"1.2.3.4")],
+            "client": ("203.0.113.7", 50000),
+        }
+        assert limiter._client_ip(scope) == "203.0.113.7"
+
+        # Без настроенных прокси заголовок не учитывается
+        limiter.trusted_proxies = []
+        scope["client"] = ("172.18.0.2", 50000)
+        assert limiter._client_ip(scope) == "172.18.0.2"
+
+    def test_forwarded_for_from_trusted_subnet(self, limiter):
+        """Тест доверия X-Forwarded-For от прокси из подсети CIDR."""
+        limiter.trusted_proxies = [ipaddress.ip_network("172.16.0.0/12")]
+        scope = {
+            "headers": [(b"x-forwarded-for", b"1.2.3.4")],
+            "client": ("172.18.0.5", 50000),
+        }
+        assert limiter._client_ip(scope) == "1.2.3.4"
+
+        scope["client"] = ("192.168.0.5", 50000)
+        assert limiter._client_ip(scope) == "192.168.0.5"
+
+        # Нераспознанный адрес прокси не считается доверенным
+        scope["client"] = ("unknown", 50000)
+        assert limiter._client_ip(scope) == "unknown"
+
+    def test_over_limit_rejected_before_app(self, limiter):
+        """Тест ответа 429 без вызова приложения."""
+        app = FastAPI()
+        calls = []
+
+        @app.get("/test/limited")
+        async def limited():
+            calls.append(1)
+            return {"ok": True}
+
+        limiter.app = app
+        client = TestClient(limiter)
+        headers = {"Authorization": "Bearer token"}
+        for _ in range(3):
+            assert client.get("/test/limited", headers=headers).status_code == 200
+
+        response = client.get("/test/limited", headers=headers)
+        assert response.status_code == 429
+        assert response.json() == {"detail": "Too many requests"}
+        assert len(calls) == 3
+        # Запросы без токена не ограничиваются
+        assert client.get("/test/limited").status_code == 200
+
+    def test_ip_key(self, limiter):
+        """Тест преобразования IP в ключ rate limit."""
+        assert limiter._ip_key("1.2.3.4") == 0x01020304
+        assert limiter._ip_key("::1") == 1
+        assert limiter._ip_key("unknown") == "unknown"
+
+    def test_max_ips_cap(self, limiter):
+        """Тест ограничения числа отслеживаемых IP."""
+        limiter.max_ips = 2
+        for ip in ("1.1.1.1", "2.2.2.2", "1.1.1.1", "3.3.3.3"):
+            limiter._is_rate_limited(ip)
+        assert list(limiter._shards[0].entries) == ["1.1.1.1", "3.3.3.3"]
+
+    def test_concurrent_requests_counted(self):
+        """Тест подсчета параллельных запросов с одного IP."""
+        limiter = RateLimitMiddleware(app=None)
+        limiter.max_requests = 10_000
+
+        def send_requests():
+            for _ in range(200):
+                limiter._is_rate_limited("1.2.3.4")
+
+        threads = [threading.Thread(target=send_requests) for _ in range(8)]
+        with patch("base.middleware.time.monotonic", return_value=1000.0):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        shard = limiter._shards[hash("1.2.3.4") % len(limiter._shards)]
+        assert shard.entries["1.2.3.4"][0] == 10_000 - 1600
+
+
+class TestGetTokenFromHeader:
+    """Unit тесты для get_token_from_header."""
+
+    @pytest.mark.asyncio
+    async def test_token_validation_cached(self):
+        """Тест повторного использования проверенного токена."""
+        _jwt_cache.clear()
+        expire = int((datetime.now(timezone.utc) + timedelta(minutes=30)).timestamp())
+        payload = JWTPayloadDTO(id=7, exp=expire, type="access")
+        credentials = Mock(credentials="cached.jwt.token")
+
+        with patch("base.dependencies._JWT_HANDLER") as mock_handler:
+            mock_handler.decode_token.return_value = payload
+            first = await get_token_from_header(Mock(), credentials)
+            second = await get_token_from_header(Mock(), credentials)
+
+        assert first == second == payload
+        mock_handler.decode_token.assert_called_once()
+        _jwt_cache.clear()
+
+    @pytest.mark.asyncio
+    async def test_cached_token_expired(self):
+        """Тест повторной проверки истекшего токена из кэша."""
+        _jwt_cache.clear()
+        expired = int((datetime.now(timezone.utc) - timedelta(minutes=1)).timestamp())
+        payload = JWTPayloadDTO(id=7, exp=expired, type="access")
+        credentials = Mock(credentials="expired.jwt.token")
+        _jwt_cache[hashlib.sha256(b"expired.jwt.token").digest()[:16]] = payload
+
+        with patch("base.dependencies._JWT_HANDLER") as mock_handler:
+            mock_handler.decode_token.return_value = payload
+            with pytest.raises(AuthenticationError):
+                await get_token_from_header(Mock(), credentials)
+
+        mock_handler.decode_token.assert_called_once()
+        _jwt_cache.clear()
+
+    def test_invalid_token_response_has_bearer_challenge(self):
+        """Тест: ответ 401 на недействительный токен содержит WWW-Authenticate."""
+        app = FastAPI()
+        add_exception_handlers(app)
+
+        @app.get("/test/protected")
+        async def protected(token=Depends(get_token_from_header)):
+            return {"id": token.id}
+
+        _jwt_cache.clear()
+        with patch("base.dependencies._JWT_HANDLER") as mock_handler:
+            mock_handler.decode_token.side_effect = InvalidTokenException("bad token")
+            response = TestClient(app).get(
+                "/test/protected", headers={"Authorization": "Bearer bad.jwt.token"}
+            )
+
+        assert response.status_code == 401
+        assert response.headers["WWW-Authenticate"] == "Bearer"
+        assert response.json()["type"] == "authentication_error"
+
+
 # =============================================================================
 # USER SERVICES TESTS
 # =============================================================================
@@ -741,6 +984,7 @@ class TestModelMetrics:
         metrics.metrics["train"]["rmse"] = 1.0
         metrics.metrics["test"]["rmse"] = 1.5
         metrics.model_version = "test_version"
+        metrics.dataset_stats = {"shipping_counts": {0: 3, 1: 2}}
 
         metrics_file = tmp_path / "metrics.json"
         metrics.save(metrics_file)
@@ -750,6 +994,7 @@ class TestModelMetrics:
             loaded_metrics = json.load(f)
             assert loaded_metrics["metrics"]["train"]["rmse"] == 1.0
             assert loaded_metrics["metrics"]["test"]["rmse"] == 1.5
+            assert loaded_metrics["dataset_stats"]["shipping_counts"]["0"] == 3
 
 
 class TestModelTrainer:
@@ -814,8 +1059,8 @@ class TestModelTrainer:
             mock_model.feature_importances_ = np.array([0.5, 0.3, 0.2])
 
             # Мокаем predict чтобы возвращал правильное количество предсказаний
-            def mock_predict(X):
-                return np.array([10.0, 15.0, 12.0, 13.0, 14.0][: len(X)])
+            def mock_predict(pool):
+                return np.array([10.0, 15.0, 12.0, 13.0, 14.0][: pool.num_row()])
 
             mock_model.predict = Mock(side_effect=mock_predict)
             mock_model.fit = Mock()
@@ -837,6 +1082,33 @@ class TestModelTrainer:
             assert "train" in trainer.metrics.metrics
             assert "test" in trainer.metrics.metrics
             assert hasattr(trainer.metrics, "feature_importance")
+            # Важность признаков отсортирована по убыванию
+            importances = list(trainer.metrics.feature_importance.values())
+            assert importances == sorted(importances, reverse=True)
+
+    def test_save_model_publishes_to_dvc_in_background(self, trainer):
+        """Тест загрузки моделей в DVC в фоновом потоке."""
+        trainer.model = Mock()
+        mock_repo = Mock()
+        with patch("pricing.model_trainer.dvc_available", True), patch(
+            "pricing.model_trainer.Repo", return_value=mock_repo, create=True
+        ):
+            trainer.save_model()
+            trainer.wait_for_publish(timeout=5)
+
+        mock_repo.add.assert_called_once_with("models")
+        mock_repo.push.assert_called_once_with("models.dvc")
+
+    def test_device_params(self, trainer):
+        """Тест выбора GPU при наличии устройства и CPU без него."""
+        with patch("pricing.model_trainer.get_gpu_device_count", return_value=1):
+            assert trainer._device_params()["task_type"] == "GPU"
+        with patch("pricing.model_trainer.get_gpu_device_count", return_value=0):
+            assert trainer._device_params() == {"task_type": "CPU"}
+        with patch(
+            "pricing.model_trainer.get_gpu_device_count", return_value=1
+        ), patch.dict("os.environ", {"PRICING_USE_GPU": "0"}):
+            assert trainer._device_params() == {"task_type": "CPU"}
 
     def test_dataset_statistics(self, trainer):
         """Тест сбора статистик датасета."""
@@ -878,6 +1150,406 @@ class TestModelTrainer:
         assert trainer.metrics.dataset_stats["brand_counts"]["Unknown"] == 2
 
 
+class TestQuickTrain:
+    """Unit тесты быстрого обучения модели."""
+
+    @pytest.fixture
+    def raw_df(self):
+        """Небольшая выборка в формате train.tsv."""
+        import pandas as pd
+
+        brands = ["Nike", "Apple", None, "Sony"]
+        categories = ["Men/Shoes/Sneakers", "Electronics/Phones/Cases", None, "Women"]
+        words = ["red", "blue", "leather", "wireless", "vintage", "cotton", "metal"]
+        rows = []
+        for i in range(24):
+            rows.append(
+                {
+                    "name": f"{words[i % 7]} {words[(i + 2) % 7]} item",
+                    "item_condition_id": i % 5 + 1,
+                    "category_name": categories[i % 4],
+                    "brand_name": brands[i % 4],
+                    "price": float(i % 6 * 10),
+                    "shipping": i % 2,
+                    "item_description": f"{words[(i + 3) % 7]} {words[(i + 5) % 7]}",
+                }
+            )
+        return pd.DataFrame(rows)
+
+    def test_label_encoder_round_trip(self):
+        """Тест: коды совпадают с LabelEncoder, неизвестная метка получает 0."""
+        import pandas as pd
+        from sklearn.preprocessing import LabelEncoder
+
+        from pricing.features import encode_labels
+        from pricing.quick_train import _fit_label_encoder
+
+        values = pd.Series(["Sony", "Apple", "Nike", "Apple"])
+        codes, encoder = _fit_label_encoder(values)
+
+        assert codes.tolist() == LabelEncoder().fit_transform(values).tolist()
+        assert encoder.inverse_transform(codes).tolist() == values.tolist()
+        assert encode_labels(encoder, pd.Series(["Nike", "Adidas"])).tolist() == [1, 0]
+
+    def test_feature_cache_hit_miss_and_eviction(self, tmp_path, raw_df):
+        """Тест: признаки берутся из кэша, старые записи вытесняются."""
+        import os
+
+        from pricing import quick_train
+
+        data_path = tmp_path / "train.tsv"
+        raw_df.to_csv(data_path, sep="\t", index=False)
+        cache_dir = tmp_path / "cache"
+
+        with patch.object(quick_train, "_CACHE_DIR", cache_dir), patch.object(
+            quick_train, "_CACHE_MAX_ENTRIES", 2
+        ), patch.object(
+            quick_train, "_build_features", wraps=quick_train._build_features
+        ) as build:
+            X, y, pipeline = quick_train._load_features(str(data_path), nrows=10)
+            assert build.call_count == 1
+
+            # Попадание: те же данные и число строк
+            X_cached, y_cached, _ = quick_train._load_features(
+                str(data_path), nrows=10
+            )
+            assert build.call_count == 1
+            assert (X_cached != X).nnz == 0
+            assert y_cached.tolist() == y.tolist()
+
+            # Промах: другое число строк - другой ключ
+            quick_train._load_features(str(data_path), nrows=20)
+            assert build.call_count == 2
+            entries = sorted(cache_dir.glob("*.joblib"))
+            assert len(entries) == 2
+
+            # Делаем записи заведомо старыми, третья запись вытесняет
+            # самую старую из них
+            oldest, newer = entries
+            os.utime(oldest, ns=(1, 1))
+            os.utime(newer, ns=(2, 2))
+            quick_train._load_features(str(data_path), nrows=15)
+
+        assert build.call_count == 3
+        remaining = set(cache_dir.glob("*.joblib"))
+        assert len(remaining) == 2
+        assert oldest not in remaining
+        assert newer in remaining
+
+    def test_dumped_pipeline_loads_in_pricing_service(self, tmp_path, raw_df):
+        """Тест: модель и pipeline quick_train загружаются в PricingService."""
+        import joblib
+
+        catboost = pytest.importorskip("catboost")
+        from pricing.pricing_service import PricingService
+        from pricing.quick_train import _build_features
+
+        X, y, pipeline = _build_features(raw_df)
+        model = catboost.CatBoostRegressor(
+            iterations=5, verbose=0, allow_writing_files=False
+        )
+        model.fit(X, y)
+        model_path = tmp_path / "model.cbm"
+        pipeline_path = tmp_path / "pipeline.pkl"
+        model.save_model(str(model_path))
+        joblib.dump(pipeline, pipeline_path)
+
+        with patch(
+            "pricing.pricing_service.get_model_path", return_value=str(model_path)
+        ), patch(
+            "pricing.pricing_service.get_preprocessing_path",
+            return_value=str(pipeline_path),
+        ), patch(
+            "pricing.pricing_service.dvc_available", False
+        ):
+            service = PricingService()
+
+        assert service.model is not None
+        assert service.preprocessing_pipeline is not None
+        # Признаки сервиса совпадают с признаками обучения
+        product = raw_df[raw_df["price"] > 0].iloc[0].drop("price").to_dict()
+        _, X_service = service._preprocess_items([product])
+        assert X_service.tolist() == X[0].toarray().tolist()
+
+        [price] = service.predict_prices([product])
+        assert service.min_price <= price <= service.max_price
+
+
+class TestPredictionCache:
+    """Unit тесты для кэша прогнозов цен."""
+
+    @pytest.fixture
+    def cache(self):
+        """Фикстура кэша без подключения к Redis."""
+        from pricing.cache import PredictionCache
+
+        return PredictionCache(ttl=60, max_connections=1)
+
+    def test_make_key_ignores_field_order(self, cache):
+        """Тест: ключ не зависит от порядка полей и включает версию модели."""
+        key = cache.make_key("abc", {"name": "Phone", "shipping": 1})
+        assert key == cache.make_key("abc", {"shipping": 1, "name": "Phone"})
+        assert key.startswith("pricing:vabc:")
+        assert key != cache.make_key("def", {"name": "Phone", "shipping": 1})
+
+    @pytest.mark.asyncio
+    async def test_redis_error_is_cache_miss(self, cache):
+        """Тест: ошибка Redis дает промах и пауза перед повторным обращением."""
+        from redis.exceptions import ConnectionError as RedisConnectionError
+
+        cache._client.mget = AsyncMock(side_effect=RedisConnectionError("down"))
+
+        assert await cache.get_many(["a", "b"]) == [None, None]
+        assert await cache.get_many(["a"]) == [None]
+        cache._client.mget.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_ml_service_uses_cache(self):
+        """Тест: из кэша берутся найденные прогнозы, остальные сохраняются."""
+        from products.domain.models import ProductData
+        from products.services.services import MLPricingService
+
+        prediction = {
+            "predicted_price": 10.0,
+            "confidence_score": 0.9,
+            "price_range": {"min": 7.0, "max": 13.0},
+            "category_analysis": {},
+        }
+        service = MLPricingService.__new__(MLPricingService)
+        service.pricing_service = Mock(
+            model_version="abc",
+            predict_price_batch=AsyncMock(
+                return_value=[{**prediction, "predicted_price": 20.0}]
+            ),
+        )
+        fake_cache = Mock(
+            make_key=lambda version, features: features["name"],
+            get_many=AsyncMock(return_value=[prediction, None]),
+            set_many=AsyncMock(),
+        )
+        products = [
+            ProductData(
+                name="Cached",
+                category_name="Electronics",
+                item_condition_id=1,
+                shipping=0,
+            ),
+            ProductData(
+                name="Fresh",
+                category_name="Electronics",
+                item_condition_id=1,
+                shipping=0,
+            ),
+        ]
+
+        with patch(
+            "products.services.services.get_prediction_cache", return_value=fake_cache
+        ):
+            results = await service.get_price_predictions(products)
+
+        assert [is_hit for _, is_hit in results] == [True, False]
+        assert results[0][0].predicted_price == 10.0
+        assert results[1][0].predicted_price == 20.0
+        # Промахи кэша предсказываются одной пачкой
+        service.pricing_service.predict_price_batch.assert_awaited_once()
+        [batch] = service.pricing_service.predict_price_batch.await_args.args
+        assert [item["name"] for item in batch] == ["Fresh"]
+        fake_cache.set_many.assert_awaited_once()
+        assert list(fake_cache.set_many.await_args.args[0]) == ["Fresh"]
+
+
+@pytest.fixture
+def feature_pipeline():
+    """Фикстура pipeline в формате quick_train."""
+    import numpy as np
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.preprocessing import LabelEncoder
+
+    def encoder(classes):
+        le = LabelEncoder()
+        le.classes_ = np.array(classes)
+        return le
+
+    return {
+        "le_brand": encoder(["Apple", "Nike"]),
+        "le_cat_main": encoder(["Men"]),
+        "le_cat_sub": encoder(["None", "Shoes"]),
+        "tfidf_name": TfidfVectorizer(max_features=10).fit(["nike shoes"]),
+        "tfidf_desc": TfidfVectorizer(max_features=10).fit(["great shoes"]),
+    }
+
+
+class TestPricingArtifacts:
+    """Unit тесты загрузки модели и pipeline ценообразования."""
+
+    def test_artifacts_loaded_once_per_file_version(self, tmp_path):
+        """Тест: pipeline загружается один раз на версию файла."""
+        import joblib
+        import numpy as np
+        from sklearn.preprocessing import LabelEncoder
+
+        from pricing.pricing_service import _load_artifacts, _mtime_ns
+
+        encoder = LabelEncoder()
+        encoder.classes_ = np.array(["Apple", "Nike"])
+        pipeline_path = tmp_path / "pipeline.pkl"
+        joblib.dump({"le_brand": encoder}, pipeline_path)
+        model_path = tmp_path / "missing.cbm"
+
+        args = (
+            str(model_path),
+            str(pipeline_path),
+            _mtime_ns(model_path),
+            _mtime_ns(pipeline_path),
+        )
+        model, pipeline, model_version = _load_artifacts(*args)
+
+        assert model is None
+        assert model_version == ""
+        assert pipeline["le_brand"].classes_.tolist() == ["Apple", "Nike"]
+        assert _load_artifacts(*args)[1] is pipeline
+
+    @pytest.fixture
+    def service(self, feature_pipeline):
+        """Сервис с небольшим pipeline, без загрузки файлов модели."""
+        from pricing.pricing_service import PricingService
+
+        service = PricingService.__new__(PricingService)
+        service.preprocessing_pipeline = feature_pipeline
+        return service
+
+    def test_preprocess_items_fills_missing_values(self, service):
+        """Тест: пропуски заполняются как в обучении, неизвестный бренд - код 0."""
+        import numpy as np
+
+        features, X = service._preprocess_items(
+            [
+                {
+                    "name": "Nike shoes",
+                    "item_description": "great shoes",
+                    "category_name": "Men/Shoes/Sneakers",
+                    "brand_name": "Nike",
+                    "item_condition_id": 1,
+                    "shipping": 0,
+                },
+                {
+                    "name": "Shoes",
+                    "item_description": None,
+                    "category_name": None,
+                    "brand_name": float("nan"),
+                    "item_condition_id": 3,
+                    "shipping": 1,
+                },
+            ]
+        )
+
+        assert X.shape == (2, 11 + 2 + 2)
+        assert X.dtype == np.float32
+        assert X[0, :11].tolist() == [1, 0, 1, 0, 1, 11, 10, 1, 1, 2, 2]
+        assert features[1]["brand_enc"] == 0
+        assert features[1]["has_brand"] == 0
+        assert features[1]["has_description"] == 0
+        assert features[1]["desc_len"] == 0
+
+    @pytest.mark.asyncio
+    async def test_predict_price_batch_isolates_bad_row(self, service):
+        """Тест: при ошибке пачки ошибку получает только плохой товар."""
+        import numpy as np
+
+        service.min_price, service.max_price = 0.1, 10000.0
+
+        # Прогноз - длина названия товара в log-scale, пустое название
+        # ломает пачку
+        def predict(X):
+            if (X[:, 6] == 0).any():
+                raise ValueError("bad row")
+            return np.log1p(X[:, 6])
+
+        service.model = Mock(predict=predict)
+
+        products = [
+            {"name": "Nike shoes", "category_name": "Men/Shoes", "shipping": 0},
+            {"name": "", "category_name": "Men/Shoes", "shipping": 1},
+            {"name": "Shoes", "category_name": "Men/Shoes", "shipping": 1},
+        ]
+        with patch(
+            "pricing.pricing_service.FeaturesData",
+            side_effect=lambda num_feature_data: num_feature_data,
+            create=True,
+        ):
+            results = await service.predict_price_batch(products)
+
+        assert [result.get("error") for result in results] == [
+            None,
+            "bad row",
+            None,
+        ]
+        assert results[0]["predicted_price"] == 10.0
+        assert results[2]["predicted_price"] == 5.0
+
+
+class TestPricingFeatures:
+    """Unit тесты построения признаков, общего для сервиса и ML воркеров."""
+
+    def test_encode_labels_unknown_is_zero(self, feature_pipeline):
+        """Тест: известные значения кодируются как в LabelEncoder, неизвестные - 0."""
+        import pandas as pd
+
+        from pricing.features import encode_labels
+
+        codes = encode_labels(
+            feature_pipeline["le_brand"], pd.Series(["Nike", "Adidas", "Apple"])
+        )
+        assert codes.tolist() == [1, 0, 0]
+
+    def test_build_features_builds_quick_train_features(self, feature_pipeline):
+        """Тест: признаки пачки и заполнение пропусков как в обучении."""
+        import numpy as np
+        import pandas as pd
+
+        from pricing.features import build_features
+
+        df = pd.DataFrame(
+            {
+                "name": ["Nike shoes", "Shoes"],
+                "item_condition_id": [1, 3],
+                "category_name": ["Men/Shoes/Sneakers", None],
+                "brand_name": ["Nike", None],
+                "shipping": [0, 1],
+                "item_description": ["great shoes", None],
+            }
+        )
+
+        X = build_features(df, feature_pipeline)
+
+        assert X.shape == (2, 11 + 2 + 2)
+        assert X.dtype == np.float32
+        assert X[0, :11].tolist() == [1, 0, 1, 0, 1, 11, 10, 1, 1, 2, 2]
+        assert X[1, :11].tolist() == [3, 1, 0, 0, 0, 0, 5, 0, 0, 0, 1]
+
+    def test_build_features_category_without_subcategory(self, feature_pipeline):
+        """Тест: категория без уровней дает подкатегорию None."""
+        import pandas as pd
+
+        from pricing.features import build_features
+
+        df = pd.DataFrame(
+            {
+                "name": ["Shoes"],
+                "item_condition_id": [1],
+                "category_name": ["Men"],
+                "brand_name": ["Apple"],
+                "shipping": [0],
+                "item_description": [""],
+            }
+        )
+
+        X = build_features(df, feature_pipeline)
+
+        # brand_enc, cat_main_enc, cat_sub_enc
+        assert X[0, 2:5].tolist() == [0, 0, 0]
+
+
 # =============================================================================
 # DATABASE TESTS
 # =============================================================================
@@ -948,3 +1620,338 @@ class TestDatabaseModels:
         with pytest.raises(Exception):
             session.add(task)
             session.commit()
+
+
+# =============================================================================
+# ML WORKER TESTS
+# =============================================================================
+
+
+@pytest.fixture(scope="module")
+def worker_module():
+    """Модуль ML воркера, он лежит вне пакета src."""
+    import importlib.util
+    from pathlib import Path
+
+    path = Path(__file__).resolve().parents[2] / "ml_worker" / "worker.py"
+    spec = importlib.util.spec_from_file_location("ml_worker_worker", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class _InlineExecutor:
+    """Исполнитель, который выполняет задачи сразу в текущем процессе."""
+
+    def submit(self, fn, *args):
+        from concurrent.futures import Future
+
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self, **kwargs):
+        pass
+
+
+class TestMLWorkerPredictions:
+    """Unit тесты прогнозирования пачек в ML воркере."""
+
+    @pytest.fixture
+    def worker(self, worker_module):
+        """Воркер без подключений к Redis, RabbitMQ и без пула процессов."""
+        import dataclasses
+        from collections import OrderedDict
+
+        worker = worker_module.ScalableMLWorker.__new__(worker_module.ScalableMLWorker)
+        worker.worker_id = "worker_test"
+        worker.config = dataclasses.replace(
+            worker_module.WorkerConfig.from_env(),
+            process_count=1,
+            predict_cache_size=2,
+        )
+        worker._prediction_cache = OrderedDict()
+        worker.executor = _InlineExecutor()
+        worker._create_executor = Mock()
+        worker.redis_client = Mock()
+        worker._pending_results = []
+        worker.is_running = True
+        return worker
+
+    @pytest.fixture(autouse=True)
+    def model(self, worker_module):
+        """Модель процесса-исполнителя, pipeline и Pool без CatBoost."""
+        import numpy as np
+
+        from concurrent.futures.process import BrokenProcessPool
+
+        # Прогноз - длина названия товара, пустое название ломает пачку,
+        # "boom" роняет процесс-исполнитель
+        def predict(pool, **kwargs):
+            names = pool.data["name"].tolist()
+            if "" in names:
+                raise ValueError("bad row")
+            if "boom" in names:
+                raise BrokenProcessPool("worker died")
+            return np.array([len(name) for name in names], dtype=float)
+
+        model = Mock(predict=Mock(side_effect=predict))
+        with patch.object(worker_module, "_MODEL", model), patch.object(
+            worker_module, "_PIPELINE", Mock(transform=lambda df: df)
+        ), patch.object(
+            worker_module, "Pool", side_effect=lambda data, **kwargs: Mock(data=data)
+        ):
+            yield model
+
+    @staticmethod
+    def _task(worker_module, task_id, name):
+        return worker_module.PricingTask(
+            task_id=task_id, product_data={"name": name, "shipping": 1}
+        )
+
+    def test_predict_batch_single_model_call(self, worker_module, worker, model):
+        """Тест: вся пачка прогнозируется одним вызовом модели."""
+        tasks = [
+            self._task(worker_module, "1", "ab"),
+            self._task(worker_module, "2", "abcd"),
+        ]
+
+        results = worker._predict_batch(tasks)
+
+        model.predict.assert_called_once()
+        assert [result.task_id for result in results] == ["1", "2"]
+        assert [result.predicted_price for result in results] == [2.0, 4.0]
+        assert results[0].price_range == {"min": 1.6, "max": 2.4}
+        assert results[0].category_analysis["shipping_impact"] == "Included"
+
+    def test_process_batch_isolates_bad_task(self, worker_module, worker, model):
+        """Тест: при ошибке пачки задачи прогнозируются по одной."""
+        tasks = [
+            self._task(worker_module, "1", "ab"),
+            self._task(worker_module, "2", ""),
+            self._task(worker_module, "3", "abc"),
+        ]
+
+        results = worker._process_batch(tasks)
+
+        assert [result.task_id for _, result in results] == ["1", "3"]
+        assert model.predict.call_count == 1 + len(tasks)
+
+    def test_process_batch_requeues_crashing_task(self, worker_module, worker, model):
+        """Тест: задача, уронившая пул, возвращается в очередь со счетчиком попыток."""
+        import msgpack
+
+        tasks = [
+            self._task(worker_module, "1", "ab"),
+            self._task(worker_module, "2", "boom"),
+            self._task(worker_module, "3", "abc"),
+        ]
+
+        results = worker._process_batch(tasks)
+
+        assert [result.task_id for _, result in results] == ["1", "3"]
+        # Пул пересоздается после падения пачки и после падения задачи
+        assert worker._create_executor.call_count == 2
+        queue_name, payload = worker.redis_client.rpush.call_args.args
+        assert queue_name == worker.config.task_queue
+        requeued = msgpack.unpackb(payload, raw=False)
+        assert requeued["task_id"] == "2"
+        assert requeued["attempts"] == 1
+        assert worker._parse_task(payload).attempts == 1
+
+    def test_process_batch_fails_task_after_max_attempts(self, worker_module, worker):
+        """Тест: после исчерпания попыток вместо повтора публикуется ошибка."""
+        task = self._task(worker_module, "1", "boom")
+        task.attempts = worker.config.max_task_attempts - 1
+
+        results = worker._process_batch([task])
+
+        worker.redis_client.rpush.assert_not_called()
+        [(failed_task, result)] = results
+        assert failed_task is task
+        assert result.task_id == "1"
+        assert result.error
+        worker.redis_client.set.assert_called_once()
+
+    def test_predict_cached_miss_then_hit(self, worker_module, worker, model):
+        """Тест: повторный товар берется из кэша, дубли в пачке считаются один раз."""
+        tasks = [
+            self._task(worker_module, "1", "ab"),
+            self._task(worker_module, "2", "abc"),
+            self._task(worker_module, "3", "ab"),
+        ]
+
+        assert worker._predict_cached(tasks).tolist() == [2.0, 3.0, 2.0]
+        [pool], _ = model.predict.call_args
+        assert pool.data["name"].tolist() == ["ab", "abc"]
+
+        model.predict.reset_mock()
+        assert worker._predict_cached(tasks[:1]).tolist() == [2.0]
+        model.predict.assert_not_called()
+
+    def test_predict_cached_evicts_least_recent(self, worker_module, worker, model):
+        """Тест: при переполнении вытесняется давно не использованный товар."""
+        worker._predict_cached([self._task(worker_module, "1", "a")])
+        worker._predict_cached([self._task(worker_module, "2", "bb")])
+        # Обращение к "a" делает его недавним, вытеснен будет "bb"
+        worker._predict_cached([self._task(worker_module, "3", "a")])
+        worker._predict_cached([self._task(worker_module, "4", "ccc")])
+
+        names = [dict(key)["name"] for key in worker._prediction_cache]
+        assert names == ["a", "ccc"]
+
+        model.predict.reset_mock()
+        worker._predict_cached([self._task(worker_module, "5", "bb")])
+        model.predict.assert_called_once()
+
+    def test_analyze_condition(self, worker):
+        """Тест описания влияния состояния товара."""
+        assert worker._analyze_condition(1) == "New - Premium pricing"
+        assert worker._analyze_condition(5) == "Poor - Significant discount"
+        assert worker._analyze_condition(0) == "Unknown condition"
+        assert worker._analyze_condition(6) == "Unknown condition"
+        assert worker._analyze_condition("1") == "Unknown condition"
+
+
+class TestResultPublisher:
+    """Unit тесты подтверждений публикации результатов в RabbitMQ."""
+
+    @pytest.fixture
+    def on_nack(self):
+        """Колбэк возврата задачи в очередь."""
+        return Mock()
+
+    @pytest.fixture
+    def publisher(self, worker_module, on_nack):
+        """Издатель с замоканным каналом, без подключения к брокеру."""
+        import pika
+
+        publisher = worker_module.ResultPublisher(
+            pika.ConnectionParameters(), on_nack=on_nack
+        )
+        publisher._channel = Mock(is_open=True)
+        return publisher
+
+    @staticmethod
+    def _item(worker_module, task_id):
+        task = worker_module.PricingTask(task_id=task_id, product_data={})
+        result = worker_module.PricingResult(
+            task_id=task_id,
+            predicted_price=10.0,
+            confidence_score=0.9,
+            price_range={"min": 8.0, "max": 12.0},
+            category_analysis={},
+            processing_time=0.01,
+            worker_id="worker_test",
+        )
+        return task, result
+
+    @classmethod
+    def _publish(cls, worker_module, publisher, task_id):
+        task, result = cls._item(worker_module, task_id)
+        publisher._publish(task, result)
+        return task
+
+    @staticmethod
+    def _confirmation(method):
+        return Mock(method=method)
+
+    def test_ack_confirms_without_requeue(self, worker_module, publisher, on_nack):
+        """Тест: подтвержденный результат не возвращается в очередь."""
+        import orjson
+        import pika
+
+        self._publish(worker_module, publisher, "1")
+        body = publisher._channel.basic_publish.call_args.kwargs["body"]
+        assert orjson.loads(body)["task_id"] == "1"
+        assert list(publisher._unconfirmed) == [1]
+
+        publisher._on_delivery_confirmation(
+            self._confirmation(pika.spec.Basic.Ack(delivery_tag=1))
+        )
+
+        assert publisher._unconfirmed == {}
+        on_nack.assert_not_called()
+
+    def test_nack_requeues_task(self, worker_module, publisher, on_nack):
+        """Тест: отклоненный брокером результат возвращает задачу в очередь."""
+        import pika
+
+        self._publish(worker_module, publisher, "1")
+        task = self._publish(worker_module, publisher, "2")
+
+        publisher._on_delivery_confirmation(
+            self._confirmation(pika.spec.Basic.Nack(delivery_tag=2))
+        )
+
+        on_nack.assert_called_once_with(task)
+        assert list(publisher._unconfirmed) == [1]
+
+    def test_multiple_confirmation(self, worker_module, publisher, on_nack):
+        """Тест: подтверждение multiple закрывает все теги до указанного."""
+        import pika
+
+        first = self._publish(worker_module, publisher, "1")
+        second = self._publish(worker_module, publisher, "2")
+        self._publish(worker_module, publisher, "3")
+
+        publisher._on_delivery_confirmation(
+            self._confirmation(pika.spec.Basic.Nack(delivery_tag=2, multiple=True))
+        )
+
+        assert [call.args[0] for call in on_nack.call_args_list] == [first, second]
+        assert list(publisher._unconfirmed) == [3]
+
+    def test_closed_channel_and_connection_requeue(
+        self, worker_module, publisher, on_nack
+    ):
+        """Тест: без канала и при обрыве соединения задачи возвращаются в очередь."""
+        pending = self._publish(worker_module, publisher, "1")
+
+        publisher._channel.is_open = False
+        skipped = self._publish(worker_module, publisher, "2")
+        on_nack.assert_called_once_with(skipped)
+
+        publisher._on_connection_closed(Mock(), "connection reset")
+
+        assert publisher.is_closed
+        assert on_nack.call_args.args[0] is pending
+        assert publisher._unconfirmed == {}
+
+    def test_results_handed_to_io_loop_in_batches(
+        self, worker_module, publisher, on_nack
+    ):
+        """Тест: результаты передаются в IO-поток пачками до flush_size штук."""
+        publisher._flush_size = 2
+        publisher._connection = Mock()
+        items = [self._item(worker_module, task_id) for task_id in ("1", "2", "3")]
+        for task, result in items:
+            publisher.publish(task, result)
+        publisher._queue.put(None)
+
+        publisher._drain_loop()
+
+        callbacks = publisher._connection.ioloop.add_callback_threadsafe.call_args_list
+        assert [call.args[0].args[0] for call in callbacks] == [items[:2], items[2:]]
+        on_nack.assert_not_called()
+
+    def test_results_requeued_when_io_loop_stopped(
+        self, worker_module, publisher, on_nack
+    ):
+        """Тест: после остановки IO-цикла задачи из очереди возвращаются в Redis."""
+        publisher._connection = Mock()
+        items = [self._item(worker_module, task_id) for task_id in ("1", "2")]
+        for task, result in items:
+            publisher.publish(task, result)
+        publisher._closed = True
+        publisher._queue.put(None)
+
+        publisher._drain_loop()
+
+        assert [call.args[0] for call in on_nack.call_args_list] == [
+            task for task, _ in items
+        ]
+        publisher._connection.ioloop.add_callback_threadsafe.assert_not_called()